@@ -1,34 +1,85 @@
+import time
+
 from flask import Flask, current_app
-from config import Config
+from config import get_config
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_limiter import Limiter
-from flask_mail import Mail
 from flask_limiter.util import get_remote_address
-from flask_debugtoolbar import DebugToolbarExtension
+from app.routing import RoutingSession, init_replicas
 
 
 login_manager = LoginManager()  # Create an instance of LoginManager
 bcrypt = Bcrypt()
-db = SQLAlchemy() # Create an instance of SQLAlchemy orm
-mail=Mail()
+db = SQLAlchemy(session_options={'class_': RoutingSession}) # Create an instance of SQLAlchemy orm
+
+
+# Only the per-route limits on the POSTs of the auth forms apply; there are no
+# app-wide default limits. See PROXY_FIX_X_FOR and RATELIMIT_STORAGE_URI.
+limiter = Limiter(key_func=get_remote_address)
+
+
+def get_mail():
+    """Return the mail state for the current app, importing flask_mail on first use.
 
+    Mail is only needed by the password reset flow, so it is kept off the
+    worker cold-start path.
+    """
+    app = current_app._get_current_object()
+    if 'mail' not in app.extensions:
+        from flask_mail import Mail
+        Mail().init_app(app)
+    return app.extensions['mail']
 
-limiter = Limiter(  # initialize rate limiter with universal limits
-        key_func=get_remote_address, default_limits=["200 per day", "50 per hour"]
-    )
 
-def create_app(config_class=Config):
+def create_app(config_class=None):
+    started = mark = time.perf_counter()
+    timings = {}
+
+    def lap(phase):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[phase] = now - mark
+        mark = now
+
     app = Flask(__name__)
-    app.config.from_object(config_class)
-    app.config['SQLALCHEMY_RECORD_QUERIES'] = True
+    app.config.from_object(config_class or get_config())
+    if app.config['PROXY_FIX_X_FOR']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'], x_proto=app.config['PROXY_FIX_X_FOR'])
+    init_replicas(app)
+
+    from app.sharding import init_sharding
+    init_sharding(app)
     db.init_app(app)  # Initialize the db object with the app
 
     login_manager.init_app(app)  # and initialize logins with the app context
     login_manager.login_view = 'auth.login'
 
-    mail.init_app(app)
+    limiter.init_app(app)
+
+    from app.templating import init_templating
+    init_templating(app)
+
+    from app.assets import init_assets
+    init_assets(app)
+
+    from app.writer import init_write_queue
+    init_write_queue(app)
+
+    from app.events import init_event_log
+    init_event_log(app)
+
+    from app.mailer import init_mail_outbox
+    init_mail_outbox(app)
+
+    from app.sessions import init_sessions
+    init_sessions(app)
+
+    from app.archive import init_archive
+    init_archive(app)
+    lap('extensions')
 
     from app.main import bp as main_bp
     app.register_blueprint(main_bp)
@@ -39,6 +90,22 @@ def create_app(config_class=Config):
     from app.registration import bp as registration_bp
     app.register_blueprint(registration_bp)
 
-    toolbar = DebugToolbarExtension(app)
+    from app.profile import bp as profile_bp
+    app.register_blueprint(profile_bp)
+
+    from app.sharding import register_sharded_models
+    from models import SHARDED_MODELS
+    register_sharded_models(app, SHARDED_MODELS)
+    lap('blueprints')
+
+    if app.config['DEBUG_TOOLBAR']:
+        from flask_debugtoolbar import DebugToolbarExtension
+        DebugToolbarExtension(app)
+    lap('debug')
+
+    timings['total'] = time.perf_counter() - started
+    app.extensions['startup_report'] = timings
+    app.logger.info('create_app finished in %.1f ms (%s)', timings['total'] * 1000,
+                    ', '.join(f'{k}={v * 1000:.1f}ms' for k, v in timings.items() if k != 'total'))
 
     return app
@@ -0,0 +1,213 @@
+import json
+import time
+import uuid
+import zlib
+from datetime import date
+
+import click
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db
+from app.events import record_event, ACCOUNT_DELETED, ACCOUNT_RESTORED
+from app.sessions import revoke_user_sessions
+from app.sharding import SHARD_PREFIX, shard_for, sharding_enabled, claim_directory_entry, release_directory_entry
+
+
+FORMAT = b'1'  # first byte of every record; bump it together with _ZDICT
+
+# zlib preset dictionary: an empty account graph in the order pack() writes it.
+# A record is well under 1 KB, too little for zlib to learn the column names
+# from, so priming it with them makes records about a third smaller. Records
+# can only be read back with the exact dictionary they were written with:
+# never edit this, add a new FORMAT instead.
+_ZDICT = (
+    b'{"social_profile":[{"user_id":"","platform":"","profile_url":"https://"}],'
+    b'"education_history":[{"user_id":"","institution_name":"","degree":"","graduation_date":null}],'
+    b'"work_experience":[{"user_id":"","company_name":"","position_title":"","start_date":"","end_date":null}],'
+    b'"skill":[{"user_id":"","skill_name":""}],'
+    b'"user_profile":[{"user_id":"","first_name":"","last_name":"","date_of_birth":"","bio":null,"hobbies":null}],'
+    b'"address":[{"user_id":"","street_address":"","city":"","state":"","zip_code":"","country":""}],'
+    b'"user":[{"id":"","username":"","email":"@gmail.com","phone_number":"","password_hash":"$2b$12$"}]}'
+)
+
+DELETED_PREFIX = 'deleted_'
+
+
+def pack(graph):
+    """Compress ``{table name: [row dict, ...]}`` into one archive record."""
+    compressor = zlib.compressobj(9, zdict=_ZDICT)
+    payload = json.dumps(graph, separators=(',', ':'), default=_encode).encode()
+    return FORMAT + compressor.compress(payload) + compressor.flush()
+
+
+def unpack(blob):
+    if blob[:1] != FORMAT:
+        raise ValueError(f'unknown archive record format {blob[:1]!r}')
+    decompressor = zlib.decompressobj(zdict=_ZDICT)
+    return json.loads(decompressor.decompress(blob[1:]) + decompressor.flush())
+
+
+def _encode(value):
+    if isinstance(value, (date, uuid.UUID)):
+        return str(value)
+    raise TypeError(f'cannot archive {type(value).__name__}')
+
+
+def _decode(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, sa.Date):
+        return date.fromisoformat(value)
+    if isinstance(column.type, sa.Uuid):
+        return uuid.UUID(value)
+    return value
+
+
+def _graph_tables(root):
+    """``root`` followed by every table with a foreign key to it, parents first."""
+    return [root] + [t for t in db.metadata.sorted_tables
+                     if t is not root and any(fk.column.table is root for fk in t.foreign_keys)]
+
+
+def _key(table, root):
+    return table.c.id if table is root else table.c.user_id
+
+
+def _move(conn, root, user_ids):
+    """Pack the graphs under ``root`` for ``user_ids`` into archived_user and delete the rows.
+
+    ``root`` is ``user`` or ``deleted_user``; records are always keyed by the
+    live table names. Returns the ids that were found.
+    """
+    from models import ArchivedUser
+
+    tables = _graph_tables(root)
+    graphs = {}
+    for table in tables:
+        name = table.name[len(DELETED_PREFIX):] if table.name.startswith(DELETED_PREFIX) else table.name
+        for row in conn.execute(sa.select(table).where(_key(table, root).in_(user_ids))):
+            row = row._asdict()
+            user_id = row['id'] if table is root else row['user_id']
+            graphs.setdefault(user_id, {}).setdefault(name, []).append(row)
+    found = [user_id for user_id in graphs if 'user' in graphs[user_id]]
+    if not found:
+        return []
+    now = time.time()
+    conn.execute(ArchivedUser.__table__.insert(),
+                 [{'user_id': user_id, 'archived_at': now, 'data': pack(graphs[user_id])} for user_id in found])
+    for table in reversed(tables):
+        conn.execute(table.delete().where(_key(table, root).in_(found)))
+    return found
+
+
+def _engine(user_id, write=False):
+    return db.engines[shard_for(user_id, write)]
+
+
+def archive_user(user_id):
+    """Soft-delete ``user_id`` into one compressed archived_user record; False if there is no such user.
+
+    The account is signed out everywhere first, so no session outlives it.
+    """
+    user_id = uuid.UUID(str(user_id))
+    revoke_user_sessions(user_id)
+    with _engine(user_id, write=True).begin() as conn:
+        found = _move(conn, db.metadata.tables['user'], [user_id])
+    if not found:
+        return False
+    release_directory_entry(user_id)
+    record_event(ACCOUNT_DELETED, user_id)
+    return True
+
+
+def load_archived(user_id):
+    """The archived graph of ``user_id`` as ``{table name: [row dict, ...]}``, or None."""
+    from models import ArchivedUser
+
+    table = ArchivedUser.__table__
+    user_id = uuid.UUID(str(user_id))
+    with _engine(user_id).connect() as conn:
+        blob = conn.execute(sa.select(table.c.data).where(table.c.user_id == user_id)).scalar()
+    return unpack(blob) if blob is not None else None
+
+
+def restore_user(user_id):
+    """Put an archived account back into the live tables; False if it is not in the archive.
+
+    Raises IntegrityError when its username or email has been taken since.
+    The session epoch is bumped, so login ids and "remember me" cookies issued
+    before the account was archived stay invalid.
+    """
+    from models import ArchivedUser
+
+    user_id = uuid.UUID(str(user_id))
+    graph = load_archived(user_id)
+    if graph is None:
+        return False
+    (user,) = graph['user']
+    claim_directory_entry(user_id, user['username'], user['email'])
+    try:
+        archive = ArchivedUser.__table__
+        with _engine(user_id, write=True).begin() as conn:
+            if not conn.execute(archive.delete().where(archive.c.user_id == user_id)).rowcount:
+                raise LookupError(f'{user_id} was restored concurrently')
+            root = db.metadata.tables['user']
+            for table in _graph_tables(root):
+                # Child rows get fresh ids; columns added since the record was packed keep their defaults
+                columns = [c for c in table.columns if not c.primary_key or c is _key(table, root)]
+                rows = [{c.name: _decode(c, row[c.name]) for c in columns if c.name in row}
+                        for row in graph.get(table.name, ())]
+                if table is root:
+                    rows[0]['session_epoch'] = user.get('session_epoch', 0) + 1
+                if rows:
+                    conn.execute(table.insert(), rows)
+    except Exception:
+        release_directory_entry(user_id)
+        raise
+    record_event(ACCOUNT_RESTORED, user_id)
+    return True
+
+
+def pack_deleted(chunk_size=500, pause=0.05, echo=print):
+    """Move everything in the deleted_* tables into archived_user, one chunk per transaction.
+
+    Packed rows leave the deleted_* tables in the same transaction, so an
+    interrupted run simply continues where it stopped. Run VACUUM (SQLite) or
+    let autovacuum (Postgres) reclaim the space afterwards.
+    """
+    root = db.metadata.tables[f'{DELETED_PREFIX}user']
+    shards = len(current_app.config['SQLALCHEMY_SHARD_URIS']) if sharding_enabled() else 0
+    binds = [f'{SHARD_PREFIX}{i}' for i in range(shards)] or [None]
+    total = 0
+    for bind_key in binds:
+        while True:
+            with db.engines[bind_key].begin() as conn:
+                ids = conn.execute(sa.select(root.c.id).order_by(root.c.id).limit(chunk_size)).scalars().all()
+                if not ids:
+                    break
+                total += len(_move(conn, root, ids))
+            echo(f'{bind_key or "primary"}: {total} accounts packed')
+            time.sleep(pause)
+    return total
+
+
+def init_archive(app):
+    @app.cli.group()
+    def archive():
+        """Compressed archive of soft-deleted accounts."""
+
+    @archive.command('pack-deleted')
+    @click.option('--chunk-size', type=int, default=500)
+    @click.option('--pause', type=float, default=0.05, help='Seconds to sleep between chunks.')
+    def pack_deleted_command(chunk_size, pause):
+        """Move accounts from the deleted_* tables into the archive."""
+        click.echo(f'{pack_deleted(chunk_size, pause, echo=click.echo)} accounts archived.')
+
+    @archive.command('restore')
+    @click.argument('user_id', type=click.UUID)
+    def restore_command(user_id):
+        """Restore one archived account."""
+        if not restore_user(user_id):
+            raise click.ClickException(f'{user_id} is not in the archive')
+        click.echo(f'{user_id} restored.')
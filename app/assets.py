@@ -0,0 +1,154 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+
+import click
+from flask import abort, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip variants are always built
+    brotli = None
+
+
+BUILD_DIR = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.html', '.svg', '.txt', '.json', '.map'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _fingerprint(path, digest):
+    root, ext = os.path.splitext(path)
+    return f'{root}.{digest[:12]}{ext}'
+
+
+def build_assets(static_folder):
+    """Copy every file under ``static_folder`` to ``dist/`` under a content-hashed name.
+
+    Compressible files also get ``.gz`` (and ``.br`` if brotli is installed)
+    siblings when they come out smaller. Returns the manifest mapping original
+    names to fingerprinted ones, which is also written to ``dist/manifest.json``.
+
+    Files of earlier builds are left in place, so pages rendered by workers
+    still running the previous release keep loading their assets during a
+    rolling deploy; ``flask assets clean`` removes them once those are gone.
+    """
+    build_dir = os.path.join(static_folder, BUILD_DIR)
+
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        if dirpath == static_folder and BUILD_DIR in dirnames:
+            dirnames.remove(BUILD_DIR)
+        for name in filenames:
+            source = os.path.join(dirpath, name)
+            filename = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            hashed = _fingerprint(filename, hashlib.sha256(data).hexdigest())
+
+            target = os.path.join(build_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+
+            if os.path.splitext(name)[1] in COMPRESSIBLE:
+                variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    variants['.br'] = brotli.compress(data, quality=11)
+                for suffix, compressed in variants.items():
+                    if len(compressed) < len(data):
+                        with open(target + suffix, 'wb') as f:
+                            f.write(compressed)
+            manifest[filename] = hashed
+
+    # Swap the manifest in whole, so a worker starting meanwhile never reads half of it
+    path = os.path.join(build_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def clean_assets(static_folder):
+    """Delete built files that the current manifest no longer refers to; returns how many."""
+    build_dir = os.path.join(static_folder, BUILD_DIR)
+    keep = {MANIFEST}
+    for hashed in load_manifest(static_folder).values():
+        keep.update((hashed, hashed + '.gz', hashed + '.br'))
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(build_dir):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.relpath(path, build_dir).replace(os.sep, '/') not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, BUILD_DIR, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def serve_static(filename):
+    """Static view: fingerprinted files are served precompressed and cached forever."""
+    app = current_app._get_current_object()
+    if posixpath.normpath(filename).startswith(f'{BUILD_DIR}/{MANIFEST}'):
+        abort(404)  # the build's bookkeeping, not an asset
+    build_dir = os.path.join(app.static_folder, BUILD_DIR)
+    if filename not in app.extensions['static_assets']['fingerprinted']:
+        # Assets of an earlier build, requested by pages from workers of the previous release
+        path = safe_join(build_dir, filename)
+        if path is None or not os.path.isfile(path) or filename == MANIFEST:
+            return app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] > 0 and os.path.isfile(os.path.join(build_dir, filename + suffix)):
+            encoding, filename = candidate, filename + suffix
+            break
+
+    response = send_from_directory(build_dir, filename, mimetype=mimetype, max_age=31536000)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_assets(app):
+    """Rewrite ``url_for('static', ...)`` to fingerprinted names and register ``flask assets build``."""
+    manifest = load_manifest(app.static_folder) if app.config['STATIC_FINGERPRINT'] else {}
+    app.extensions['static_assets'] = {'manifest': manifest, 'fingerprinted': set(manifest.values())}
+
+    if manifest:
+        @app.url_defaults
+        def fingerprint_static_url(endpoint, values):
+            if endpoint == 'static' and 'filename' in values:
+                values['filename'] = manifest.get(values['filename'], values['filename'])
+
+    app.view_functions['static'] = serve_static
+
+    @app.cli.group()
+    def assets():
+        """Static asset pipeline."""
+
+    @assets.command('build')
+    def build():
+        """Fingerprint and precompress everything under the static folder."""
+        manifest = build_assets(app.static_folder)
+        click.echo(f'Built {len(manifest)} assets into {os.path.join(app.static_folder, BUILD_DIR)}'
+                   f" ({'gzip + brotli' if brotli is not None else 'gzip only, brotli not installed'})")
+
+    @assets.command('clean')
+    def clean():
+        """Remove files of earlier builds; run once no worker of the previous release is left."""
+        click.echo(f'Removed {clean_assets(app.static_folder)} files of earlier builds.')
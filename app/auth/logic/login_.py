@@ -3,7 +3,8 @@ from flask_login import login_user, current_user
 
 from app import bcrypt
 from app.auth.forms import LoginForm
-from models import User
+from app.events import record_event, LOGIN, LOGIN_FAILED
+from app.sharding import find_user
 
 
 def login_():
@@ -11,13 +12,15 @@ def login_():
         return redirect(url_for('main.index'))
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first()
+        user = find_user(username=form.username.data)
 
         if user and bcrypt.check_password_hash(user.password_hash, form.password.data):
             login_user(user, remember=form.remember.data)
+            record_event(LOGIN, user.id)
             session['user_uuid'] = str(user.id)  # Store user UUID in session for future use
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('main.index'))
         else:
+            record_event(LOGIN_FAILED, user.id if user else None)
             flash('Login Unsuccessful. Please check username and password', 'danger')
     return render_template('auth/login.html', form=form)
\ No newline at end of file
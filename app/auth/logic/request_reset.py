@@ -1,26 +1,30 @@
 
-import jwt
 from flask import render_template, redirect, url_for, flash
-from app import current_app, mail
-from flask_mail import Message
+from app import current_app
+from app.mailer import send_message
 from app.auth.forms import RequestResetForm
 from datetime import datetime, timedelta, timezone
-from models import User
+from app.events import record_event, RESET_REQUESTED
+from app.sharding import find_user
 
 def send_email(to, subject, template):
+    from flask_mail import Message  # imported lazily, only the reset flow sends mail
+
     msg = Message(subject=subject,
                   recipients=[to],
                   sender=current_app.config['MAIL_DEFAULT_SENDER'])
     msg.body = template
-    mail.send(msg)
+    send_message(msg)
 
 def reset_req():
 
     form = RequestResetForm()
     if form.validate_on_submit():
 
-        user = User.query.filter_by(email=form.email.data).first()
+        user = find_user(email=form.email.data)
         if user:
+            import jwt
+
             token_expiry = datetime.now(tz=timezone.utc) + timedelta(hours=2)  # Token expires in 2 hours
             token_data = {
                 'user_id': str(user.id),
@@ -30,6 +34,7 @@ def reset_req():
             reset_link = url_for('auth.password_reset', token=token, _external=True)
             print(reset_link)
             send_email(to=user.email, subject='Password Reset Request', template=f'your reset link is: {reset_link}')
+            record_event(RESET_REQUESTED, user.id)
 
         flash('An email has been sent with instructions to reset your password.', 'info')
         return redirect(url_for('auth.logout'))
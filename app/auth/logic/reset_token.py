@@ -1,12 +1,17 @@
 from datetime import datetime
-import jwt
 import uuid
 from flask import render_template, redirect, url_for, flash
-from app import current_app, bcrypt, db
+from app import current_app, bcrypt
+from app.events import record_event, PASSWORD_RESET
+from app.sessions import revoke_user_sessions
+from app.sharding import find_user
+from app.writer import submit_write, wait_write
 from app.auth.forms import ResetPasswordForm
 from models import User
 
 def reset_token(token):
+    import jwt  # imported lazily to keep it off the worker cold-start path
+
     try:
         # Decode the token and check if it's expired
         token_data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
@@ -19,7 +24,7 @@ def reset_token(token):
             flash('The reset link has expired.', 'danger')
             return redirect(url_for('home'))
 
-        user = User.query.filter_by(id=user_uuid).first()
+        user = find_user(id=user_uuid)
         if not user:
             flash('Invalid token.', 'danger')
             return redirect(url_for('auth.login'))
@@ -27,8 +32,11 @@ def reset_token(token):
         form = ResetPasswordForm()
         if form.validate_on_submit():
             hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
-            user.password_hash = hashed_password
-            db.session.commit()
+            user_id = user.id
+            wait_write(submit_write(lambda session: session.query(User).filter_by(id=user_id).update(
+                {'password_hash': hashed_password}), user_id=user_id))
+            record_event(PASSWORD_RESET, user_id)
+            revoke_user_sessions(user_id)  # sessions opened with the old password end here
             flash('Your password has been updated! You can now log in.', 'success')
             return redirect(url_for('auth.login'))
 
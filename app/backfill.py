@@ -0,0 +1,68 @@
+import time
+
+import sqlalchemy as sa
+
+from app import db
+
+
+def backfill(name, table, update, chunk_size=1000, pause=0.05, bind_key=None, key=None):
+    """Walk ``table`` in primary-key order and call ``update(conn, rows)`` on one chunk at a time.
+
+    Each chunk runs in its own short transaction together with its checkpoint in
+    ``backfill_progress``, so locks are held for one chunk only and a rerun with
+    the same ``name`` resumes after the last committed chunk. Between chunks the
+    helper sleeps ``pause`` seconds plus as long as the chunk took, leaving the
+    database at least half idle for logins. Returns the number of rows visited.
+
+    Rows are walked by ``key``, which defaults to the table's single-column
+    primary key, or its ``id`` column for a lightweight ``sa.table()``.
+
+    Run it in its own revision, after the one that added the column has
+    committed (env.py uses one transaction per revision), e.g.::
+
+        def upgrade():
+            user = sa.table('user', sa.column('id', sa.Uuid), sa.column('email', sa.String),
+                            sa.column('email_lower', sa.String))
+
+            def lower(conn, rows):
+                conn.execute(user.update().where(user.c.id == sa.bindparam('uid')),
+                             [{'uid': row.id, 'email_lower': row.email.lower()} for row in rows])
+
+            backfill('user.email_lower', user, lower)
+    """
+    from models import BackfillProgress
+
+    progress = BackfillProgress.__table__
+    engine = db.engines[bind_key]
+    if key is None:
+        (key,) = list(table.primary_key) or [table.c.id]
+
+    with engine.begin() as conn:
+        state = conn.execute(sa.select(progress).where(progress.c.name == name)).first()
+        if state is None:
+            conn.execute(progress.insert().values(name=name, last_key=None, rows=0, finished=False))
+            last_key, total = None, 0
+        elif state.finished:
+            return state.rows
+        else:
+            last_key, total = state.last_key, state.rows
+    if last_key is not None:
+        last_key = key.type.python_type(last_key)
+
+    while True:
+        started = time.monotonic()
+        with engine.begin() as conn:
+            query = sa.select(table).order_by(key).limit(chunk_size)
+            if last_key is not None:
+                query = query.where(key > last_key)
+            rows = conn.execute(query).all()
+            if rows:
+                update(conn, rows)
+                last_key = getattr(rows[-1], key.name)
+                total += len(rows)
+            conn.execute(progress.update().where(progress.c.name == name).values(
+                last_key=str(last_key) if last_key is not None else None, rows=total,
+                finished=len(rows) < chunk_size))
+        if len(rows) < chunk_size:
+            return total
+        time.sleep(pause + time.monotonic() - started)
@@ -0,0 +1,226 @@
+import atexit
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import click
+import sqlalchemy as sa
+from flask import current_app, has_request_context, request
+
+from app import db
+
+
+log = logging.getLogger(__name__)
+
+LOGIN = 'login'
+LOGIN_FAILED = 'login_failed'
+RESET_REQUESTED = 'reset_requested'
+PASSWORD_RESET = 'password_reset'
+ACCOUNT_DELETED = 'account_deleted'
+ACCOUNT_RESTORED = 'account_restored'
+
+FIELDS = ('ts', 'kind', 'user_id', 'ip')
+
+
+class TableSink:
+    """Appends batches to the ``auth_event`` table with one executemany per flush."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def write(self, events):
+        from models import AuthEvent
+
+        with self.engine.begin() as conn:
+            conn.execute(AuthEvent.__table__.insert(), [dict(zip(FIELDS, event)) for event in events])
+
+    def read(self, since=None, until=None, kind=None):
+        from models import AuthEvent
+
+        table = AuthEvent.__table__
+        query = sa.select(*(table.c[f] for f in FIELDS)).order_by(table.c.id)
+        if since is not None:
+            query = query.where(table.c.ts >= since)
+        if until is not None:
+            query = query.where(table.c.ts < until)
+        if kind is not None:
+            query = query.where(table.c.kind == kind)
+        with self.engine.connect() as conn:
+            for row in conn.execution_options(stream_results=True, yield_per=1000).execute(query):
+                yield tuple(row)
+
+
+class SegmentSink:
+    """Appends batches as JSON lines to ``events-<start>-<pid>.jsonl`` files, starting a new one past ``max_bytes``.
+
+    Every process writes its own segments, so workers sharing the directory
+    never append to the same file; segments are read back in order of the
+    time they were started.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._path = None
+        self._size = 0
+        self._pid = None
+        os.makedirs(directory, exist_ok=True)
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, 'events-*.jsonl')))
+
+    def write(self, events):
+        if self._pid != os.getpid() or self._size >= self.max_bytes:
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, f'events-{time.time_ns() // 1000:016d}-{self._pid}.jsonl')
+        with open(self._path, 'a') as f:
+            f.write(''.join(json.dumps(event, separators=(',', ':')) + '\n' for event in events))
+            self._size = f.tell()
+
+    def read(self, since=None, until=None, kind=None):
+        for path in self.segments():
+            with open(path) as f:
+                for line in f:
+                    event = tuple(json.loads(line))
+                    if since is not None and event[0] < since:
+                        continue
+                    if until is not None and event[0] >= until:
+                        continue
+                    if kind is not None and event[1] != kind:
+                        continue
+                    yield event
+
+
+class EventLog:
+    """In-memory ring buffer of auth events drained in batches by a background flusher.
+
+    ``record`` only appends a tuple under a lock. When the buffer is full, new
+    events are dropped and counted rather than blocking the request.
+    """
+
+    def __init__(self, sink, capacity=10000, batch_size=500, interval=1.0):
+        self.sink = sink
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.interval = interval
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def record(self, kind, user_id=None, ip=None):
+        event = (time.time(), kind, str(user_id) if user_id is not None else None, ip)
+        with self._lock:
+            if len(self._buffer) >= self.capacity:
+                self.dropped += 1
+                return
+            self._buffer.append(event)
+            self.recorded += 1
+            pending = len(self._buffer)
+        if self._thread is None or self._pid != os.getpid():
+            self._start()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        while True:
+            with self._lock:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if not batch:
+                return
+            try:
+                self.sink.write(batch)
+            except Exception:
+                self.failed += len(batch)
+                log.exception('dropping %d auth events after a failed flush', len(batch))
+            else:
+                self.flushed += len(batch)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._buffer)
+        return {'recorded': self.recorded, 'flushed': self.flushed, 'pending': pending,
+                'dropped': self.dropped, 'failed': self.failed}
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='auth-event-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        reported = 0
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+            if self.dropped > reported:
+                log.warning('auth event buffer full, %d events dropped so far', self.dropped)
+                reported = self.dropped
+
+
+def record_event(kind, user_id=None):
+    """Queue an auth event for the background flusher; cheap enough for the request path."""
+    event_log = current_app.extensions.get('event_log')
+    if event_log is not None:
+        event_log.record(kind, user_id, request.remote_addr if has_request_context() else None)
+
+
+def _parse_time(value):
+    if value is None:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)  # times without an offset are UTC
+    return moment.timestamp()
+
+
+def init_event_log(app):
+    if not app.config['EVENT_LOG_ENABLED']:
+        return
+    if app.config['EVENT_LOG_SINK'] == 'segments':
+        sink = SegmentSink(app.config['EVENT_LOG_DIR'] or os.path.join(app.instance_path, 'events'),
+                           app.config['EVENT_LOG_SEGMENT_BYTES'])
+    else:
+        with app.app_context():
+            sink = TableSink(db.engines[None])
+    event_log = EventLog(sink, capacity=app.config['EVENT_LOG_CAPACITY'],
+                         batch_size=app.config['EVENT_LOG_BATCH_SIZE'],
+                         interval=app.config['EVENT_LOG_FLUSH_INTERVAL'])
+    app.extensions['event_log'] = event_log
+    atexit.register(event_log.flush)
+
+    @app.cli.group()
+    def events():
+        """Auth event log."""
+
+    @events.command('export')
+    @click.option('--since', help='ISO timestamp, UTC unless it has an offset; inclusive.')
+    @click.option('--until', help='ISO timestamp, UTC unless it has an offset; exclusive.')
+    @click.option('--kind', type=click.Choice([LOGIN, LOGIN_FAILED, RESET_REQUESTED, PASSWORD_RESET, ACCOUNT_DELETED,
+                                                ACCOUNT_RESTORED]))
+    @click.option('--format', 'fmt', type=click.Choice(['jsonl', 'csv']), default='jsonl')
+    def export(since, until, kind, fmt):
+        """Stream matching events to stdout."""
+        rows = sink.read(_parse_time(since), _parse_time(until), kind)
+        if fmt == 'csv':
+            writer = csv.writer(sys.stdout)
+            writer.writerow(FIELDS)
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                sys.stdout.write(json.dumps(dict(zip(FIELDS, row))) + '\n')
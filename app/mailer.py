@@ -0,0 +1,163 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import current_app
+
+from app import get_mail
+
+
+log = logging.getLogger(__name__)
+
+
+class MailOutbox:
+    """Sends mail in the background so a slow SMTP relay never holds a request worker.
+
+    With aiosmtplib installed, one event-loop thread keeps up to ``concurrency``
+    SMTP conversations in flight; otherwise ``concurrency`` threads each send
+    through flask_mail. Either way the request only pays for queueing the message.
+
+    A failed send is tried again up to ``retries`` times, waiting ``retry_delay``
+    seconds and doubling that after each attempt. At interpreter exit (a graceful
+    worker restart) the outbox waits up to ``drain_timeout`` seconds for queued
+    mail to go out instead of dropping it with its threads.
+    """
+
+    def __init__(self, app, concurrency=4, retries=3, retry_delay=2.0, drain_timeout=30.0):
+        self.app = app
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.drain_timeout = drain_timeout
+        self.smtp = None
+        self.sent = 0
+        self.failed = 0
+        self._pid = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, msg):
+        self._ensure_started()
+        if self.smtp is not None:
+            # Rendered here under an app context with the mail extension set up:
+            # flask_mail reads both to build the message, and the event loop thread has neither.
+            with self.app.app_context():
+                get_mail()
+                envelope = (msg.as_bytes(), msg.sender if isinstance(msg.sender, str) else msg.sender[1],
+                            list(msg.send_to), msg.recipients)
+            future = asyncio.run_coroutine_threadsafe(self._send_async(*envelope), self._loop)
+        else:
+            future = self._executor.submit(self._send_sync, msg)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def drain(self, timeout=None):
+        """Wait up to ``timeout`` (default ``drain_timeout``) seconds for queued mail; True if none is left."""
+        if self._pid != os.getpid():
+            return True
+        with self._lock:
+            pending = list(self._pending)
+        if pending:
+            log.info('waiting for %d queued mails', len(pending))
+        _, not_done = wait(pending, self.drain_timeout if timeout is None else timeout)
+        if not_done:
+            log.warning('%d queued mails were not sent before shutdown', len(not_done))
+        return not not_done
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def _ensure_started(self):
+        # Threads and event loops do not survive a fork, so each worker builds its own.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            try:
+                import aiosmtplib  # optional, imported on first send to keep it off cold start
+            except ImportError:
+                aiosmtplib = None
+            self.smtp = aiosmtplib
+            if aiosmtplib is not None:
+                self._loop = asyncio.new_event_loop()
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+                threading.Thread(target=self._loop.run_forever, name='mail-outbox', daemon=True).start()
+            else:
+                self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='mail-outbox')
+            if self._pid is None:
+                atexit.register(self.drain)  # inherited by forked workers, where drain() checks the pid
+            self._pending = set()
+            self._pid = os.getpid()
+
+    def _send_sync(self, msg):
+        for attempt in range(self.retries + 1):
+            try:
+                with self.app.app_context():
+                    get_mail().send(msg)
+            except Exception:
+                if attempt < self.retries:
+                    log.warning('sending mail to %s failed, retrying', msg.recipients, exc_info=True)
+                    time.sleep(self.retry_delay * 2 ** attempt)
+                    continue
+                self.failed += 1
+                log.exception('sending mail to %s failed', msg.recipients)
+            else:
+                self.sent += 1
+            return
+
+    async def _send_async(self, message, sender, send_to, recipients):
+        config = self.app.config
+        if config.get('MAIL_SUPPRESS_SEND'):
+            return
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    await self.smtp.send(
+                        message,
+                        sender=sender,
+                        recipients=send_to,
+                        hostname=config.get('MAIL_SERVER') or '127.0.0.1',
+                        port=int(config.get('MAIL_PORT') or 25),
+                        username=config.get('MAIL_USERNAME'),
+                        password=config.get('MAIL_PASSWORD'),
+                        start_tls=bool(config.get('MAIL_USE_TLS')),
+                        use_tls=bool(config.get('MAIL_USE_SSL')),
+                    )
+            except Exception:
+                if attempt < self.retries:
+                    log.warning('sending mail to %s failed, retrying', recipients, exc_info=True)
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)  # outside the semaphore
+                    continue
+                self.failed += 1
+                log.exception('sending mail to %s failed', recipients)
+            else:
+                self.sent += 1
+            return
+
+
+def send_message(msg):
+    """Queue ``msg`` on the app's outbox, or send it right away when MAIL_OUTBOX_ENABLED is off."""
+    outbox = current_app.extensions.get('mail_outbox')
+    if outbox is None:
+        get_mail().send(msg)
+        return None
+    return outbox.submit(msg)
+
+
+def init_mail_outbox(app):
+    if app.config['MAIL_OUTBOX_ENABLED']:
+        app.extensions['mail_outbox'] = MailOutbox(
+            app,
+            concurrency=app.config['MAIL_OUTBOX_CONCURRENCY'],
+            retries=app.config['MAIL_OUTBOX_RETRIES'],
+            retry_delay=app.config['MAIL_OUTBOX_RETRY_DELAY'],
+            drain_timeout=app.config['MAIL_OUTBOX_DRAIN_TIMEOUT'],
+        )
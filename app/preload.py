@@ -0,0 +1,55 @@
+import gc
+import importlib
+import os
+
+import sqlalchemy as sa
+from limits.storage import MemoryStorage
+
+from app import db, limiter
+
+
+# Imported lazily on the request path to keep a single process's cold start
+# short; a preloading master imports them once for every worker instead.
+LAZY_MODULES = ('jwt', 'flask_mail', 'email_validator')
+
+
+def preload(app):
+    """Warm ``app`` in a forking server's master so its workers share it copy-on-write.
+
+    Configures the mappers, compiles every template and the URL map, imports
+    the lazily loaded modules, drops the master's database connections and
+    then freezes everything allocated so far out of the garbage collector,
+    whose bookkeeping would otherwise write to every tracked object in each
+    worker and unshare its page. The per-worker reset in ``after_fork`` is
+    registered with ``os.register_at_fork``, so it runs under any server that
+    forks after importing the app (``gunicorn --preload``, uWSGI without
+    lazy-apps). Returns ``app``.
+    """
+    sa.orm.configure_mappers()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    app.url_map.update()
+    for module in LAZY_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    os.register_at_fork(after_in_child=lambda: after_fork(app))
+    gc.freeze()
+    return app
+
+
+def after_fork(app):
+    """Give a freshly forked worker its own database connections and rate-limit counters.
+
+    Background threads (write queue, event log, mail outbox, session sweeper)
+    notice the new pid and start their own on first use.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)  # forget inherited connections without closing the master's sockets
+    if isinstance(limiter.storage, MemoryStorage):
+        limiter.storage.reset()  # shared storages (redis, memcached) keep counting across workers
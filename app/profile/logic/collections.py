@@ -0,0 +1,170 @@
+from datetime import date
+
+import sqlalchemy as sa
+from flask import abort, current_app, jsonify, request
+from flask_login import current_user
+
+from app import db
+from app.sharding import use_shard
+from app.writer import submit_write, wait_write
+from models import User, Skill, WorkExperience, EducationHistory, SocialProfile
+
+# URL name -> model of each collection that is read and replaced as a whole
+COLLECTIONS = {
+    'skills': Skill,
+    'work-experience': WorkExperience,
+    'education': EducationHistory,
+    'social-profiles': SocialProfile,
+}
+
+
+class VersionConflict(Exception):
+    """The user's collections were changed since the version the client sent."""
+
+
+def _fields(model):
+    return [column for column in model.__table__.columns if column.name not in ('id', 'user_id')]
+
+
+def _select(model, user_id):
+    columns = [model.id] + [getattr(model, column.name) for column in _fields(model)]
+    return sa.select(*columns).where(model.user_id == user_id).order_by(model.id)
+
+
+def _serialize(model, row):
+    item = {'id': row.id}
+    for column in _fields(model):
+        value = getattr(row, column.name)
+        item[column.name] = value.isoformat() if isinstance(value, date) else value
+    return item
+
+
+def _coerce(column, value):
+    if value is None:
+        if not column.nullable:
+            raise ValueError('required')
+        return None
+    if isinstance(column.type, sa.Date):
+        try:
+            return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError('expected a YYYY-MM-DD date') from None
+    if not isinstance(value, str):
+        raise ValueError('expected a string')
+    if column.type.length and len(value) > column.type.length:
+        raise ValueError(f'at most {column.type.length} characters')
+    return value
+
+
+def parse_items(model, items):
+    """Validate a posted list against ``model``'s columns, returning ``(rows, errors)``.
+
+    Rows are column dicts; those carrying an ``id`` from an earlier read are
+    updates, the others inserts. ``errors`` maps item positions to problems.
+    """
+    if not isinstance(items, list):
+        return [], {'items': 'expected a list'}
+    limit = current_app.config['PROFILE_COLLECTION_MAX_ITEMS']
+    if len(items) > limit:
+        return [], {'items': f'at most {limit} items'}
+
+    fields = _fields(model)
+    names = {column.name for column in fields} | {'id'}
+    rows, errors, ids = [], {}, set()
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[position] = 'expected an object'
+            continue
+        problems = {name: 'unknown field' for name in item if name not in names}
+        row = {}
+        if 'id' in item:
+            if type(item['id']) is not int or item['id'] in ids:
+                problems['id'] = 'expected the unique id of an existing item'
+            ids.add(item['id'])
+            row['id'] = item['id']
+        for column in fields:
+            try:
+                row[column.name] = _coerce(column, item.get(column.name))
+            except ValueError as e:
+                problems[column.name] = str(e)
+        if problems:
+            errors[position] = problems
+        rows.append(row)
+    return rows, errors
+
+
+def replace_collection(model, user_id, version, rows):
+    """Make ``rows`` the whole of ``user_id``'s ``model`` collection in one transaction.
+
+    Only the difference to the stored rows is written: one DELETE for the rows
+    left out, one executemany UPDATE for the changed ones and one executemany
+    INSERT for the new ones. ``version`` must match the user's
+    ``collections_version``, which is bumped in the same transaction; otherwise
+    VersionConflict is raised and nothing changes.
+    """
+    table = model.__table__
+    users = User.__table__
+    fields = [column.name for column in _fields(model)]
+
+    def replace(session):
+        statements = 0
+
+        def execute(statement, params=None):
+            nonlocal statements
+            statements += 1
+            return session.execute(statement, params)
+
+        # Taking the version first also takes the row lock that serializes concurrent editors
+        bumped = execute(users.update().where(users.c.id == user_id, users.c.collections_version == version)
+                         .values(collections_version=version + 1))
+        if not bumped.rowcount:
+            raise VersionConflict(version)
+
+        current = {row.id: row for row in execute(_select(model, user_id))}
+        unknown = [row['id'] for row in rows if 'id' in row and row['id'] not in current]
+        if unknown:
+            raise LookupError(f'no such items: {unknown}')
+        kept = {row['id'] for row in rows if 'id' in row}
+        deleted = [item_id for item_id in current if item_id not in kept]
+        updated = [row for row in rows if 'id' in row
+                   and any(row[name] != getattr(current[row['id']], name) for name in fields)]
+        inserted = [row for row in rows if 'id' not in row]
+
+        if deleted:
+            execute(table.delete().where(table.c.id.in_(deleted)))
+        if updated:
+            execute(table.update().where(table.c.id == sa.bindparam('_id')),
+                    [{'_id': row['id'], **{name: row[name] for name in fields}} for row in updated])
+        if inserted:
+            execute(table.insert(), [{'user_id': user_id, **row} for row in inserted])
+        items = [_serialize(model, row) for row in execute(_select(model, user_id))]
+        return {'version': version + 1, 'items': items, 'inserted': len(inserted),
+                'updated': len(updated), 'deleted': len(deleted), 'statements': statements}
+
+    return wait_write(submit_write(replace, user_id=user_id))
+
+
+def collection(name):
+    model = COLLECTIONS.get(name)
+    if model is None:
+        abort(404)
+    user_id = current_user.id
+
+    if request.method == 'GET':
+        use_shard(user_id)
+        rows = db.session.execute(_select(model, user_id))
+        return jsonify(version=current_user.collections_version, items=[_serialize(model, row) for row in rows])
+
+    payload = request.get_json()
+    if not isinstance(payload, dict) or type(payload.get('version')) is not int:
+        return jsonify(errors={'version': 'send the version returned by the last read'}), 400
+    rows, errors = parse_items(model, payload.get('items'))
+    if errors:
+        return jsonify(errors=errors), 400
+    try:
+        result = replace_collection(model, user_id, payload['version'], rows)
+    except VersionConflict:
+        return jsonify(errors={'version': 'changed since it was read; read the collection again'}), 409
+    except LookupError as e:
+        return jsonify(errors={'items': str(e)}), 400
+    return jsonify(result)
@@ -0,0 +1,12 @@
+from flask_login import login_required
+
+from app import limiter
+from app.profile import bp
+from app.profile.logic.collections import collection
+
+
+@bp.route('/api/profile/<name>', methods=['GET', 'PUT'])
+@limiter.limit("60 per minute", methods=['PUT'])
+@login_required
+def profile_collection(name):
+    return collection(name)
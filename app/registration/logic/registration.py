@@ -1,11 +1,14 @@
 from datetime import datetime
+from uuid import uuid4
 
 from flask import render_template, redirect, url_for, flash
 from flask_login import current_user
 
 from app.registration.forms import RegistrationForm
 from models import bcrypt
-from models import db, User, Address, UserProfile
+from models import User, Address, UserProfile
+from app.sharding import claim_directory_entry, release_directory_entry
+from app.writer import submit_write, wait_write
 
 def registration():
     if current_user.is_authenticated:
@@ -14,35 +17,47 @@ def registration():
     form = RegistrationForm()
     if form.validate_on_submit():
         hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
-        user: User = User(
-            username=form.username.data,
-            email=form.email.data,
-            password_hash=hashed_password,
-            phone_number=form.phone_number.data
-        )
-
-        db.session.add(user)
-        db.session.commit()
-
-        address: Address = Address(
-            user_id=user.id,
-            street_address=form.street_address.data,
-            city=form.city.data,
-            state=form.state.data,
-            zip_code=form.zip_code.data,
-            country=form.country.data
-        )
-        db.session.add(address)
-        # Create user profile
-        user_profile: UserProfile = UserProfile(
-            user_id=user.id,
-            first_name=form.first_name.data,
-            last_name=form.last_name.data,
-            date_of_birth=datetime.strptime(form.date_of_birth.data, '%d/%m/%Y'),
-            bio=form.bio.data,
-            hobbies=form.hobbies.data)
-        db.session.add(user_profile)
-        db.session.commit()
+        user_id = uuid4()
+
+        def create_account(session):
+            user: User = User(
+                id=user_id,
+                username=form.username.data,
+                email=form.email.data,
+                password_hash=hashed_password,
+                phone_number=form.phone_number.data
+            )
+
+            session.add(user)
+            session.flush()
+
+            address: Address = Address(
+                user_id=user.id,
+                street_address=form.street_address.data,
+                city=form.city.data,
+                state=form.state.data,
+                zip_code=form.zip_code.data,
+                country=form.country.data
+            )
+            session.add(address)
+            # Create user profile
+            user_profile: UserProfile = UserProfile(
+                user_id=user.id,
+                first_name=form.first_name.data,
+                last_name=form.last_name.data,
+                date_of_birth=datetime.strptime(form.date_of_birth.data, '%d/%m/%Y'),
+                bio=form.bio.data,
+                hobbies=form.hobbies.data)
+            session.add(user_profile)
+            return user.id
+
+        # With sharded users the username/email claim lives in the global directory
+        claim_directory_entry(user_id, form.username.data, form.email.data)
+        try:
+            wait_write(submit_write(create_account, user_id=user_id))
+        except Exception:
+            release_directory_entry(user_id)
+            raise
         flash('Your account has been created! You can now log in.', 'success')
         return redirect(url_for('auth.login'))
     return render_template('registration/register.html', form=form)
\ No newline at end of file
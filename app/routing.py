@@ -0,0 +1,82 @@
+import random
+import time
+
+import sqlalchemy as sa
+from flask import current_app, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+
+
+REPLICA_PREFIX = 'replica_'
+STICKY_KEY = '_primary_until'
+
+
+class RoutingSession(Session):
+    """``db.session`` that sends plain reads to a replica bind and everything else to the primary.
+
+    Statements on user-owned tables go to the session's user shard instead, when
+    users are sharded (see ``app.sharding``).
+
+    Once the session has flushed or committed, it sticks to the primary for the
+    rest of the app context. After a commit the browser session also sticks to
+    the primary for REPLICA_STICKY_SECONDS, so the next requests read their own
+    writes while replicas catch up.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            from app.sharding import shard_engine
+            engine = shard_engine(self, mapper, clause)
+            if engine is not None:
+                return engine
+        if bind is None and self._reads_from_replica(mapper, clause):
+            replicas = current_app.extensions['replica_binds']
+            return self._db.engines[random.choice(replicas)]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, mapper, clause):
+        if not current_app.extensions.get('replica_binds') or self._flushing or self.info.get('primary'):
+            return False
+        if not isinstance(clause, sa.Select) or clause._for_update_arg is not None:
+            return False
+        if mapper is not None and sa.inspect(mapper).local_table.metadata.info.get('bind_key') is not None:
+            return False  # models on their own bind are not replicated
+        if has_request_context() and flask_session.get(STICKY_KEY, 0) > time.time():
+            self.info['primary'] = True
+            return False
+        return True
+
+
+@sa.event.listens_for(RoutingSession, 'do_orm_execute')
+def _stick_after_bulk_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['primary'] = True
+
+
+@sa.event.listens_for(RoutingSession, 'after_flush')
+def _stick_after_flush(session, flush_context):
+    session.info['primary'] = True
+
+
+@sa.event.listens_for(RoutingSession, 'after_commit')
+def _stick_after_commit(session):
+    session.info['primary'] = True
+    stick_to_primary()
+
+
+def stick_to_primary():
+    """Route this browser session's reads to the primary for a while, e.g. after a write made elsewhere."""
+    if has_request_context() and current_app.extensions.get('replica_binds'):
+        flask_session[STICKY_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+
+def init_replicas(app):
+    """Register SQLALCHEMY_REPLICA_URIS as ``replica_<n>`` binds; must run before ``db.init_app``."""
+    uris = app.config['SQLALCHEMY_REPLICA_URIS']
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    keys = []
+    for i, uri in enumerate(uris):
+        key = f'{REPLICA_PREFIX}{i}'
+        binds[key] = uri
+        keys.append(key)
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.extensions['replica_binds'] = keys
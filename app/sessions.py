@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import uuid
+
+import sqlalchemy as sa
+from flask import current_app
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from app import db
+from app.writer import submit_write, wait_write
+
+try:
+    import msgpack
+except ImportError:  # declared, but sessions still work without it by falling back to compact JSON
+    msgpack = None
+
+
+log = logging.getLogger(__name__)
+
+_tagger = TaggedJSONSerializer()
+
+
+def dumps(data):
+    """Compact binary form of a session dict: msgpack when installed, else minified JSON."""
+    tagged = _tagger.tag(data)
+    if msgpack is not None:
+        return b'm' + msgpack.packb(tagged, use_bin_type=True)
+    return b'j' + json.dumps(tagged, separators=(',', ':')).encode()
+
+
+def loads(blob):
+    tagged = msgpack.unpackb(blob[1:], raw=False) if blob[:1] == b'm' else json.loads(blob[1:])
+    return _untag(tagged)
+
+
+def _untag(value):
+    # Inside out, like the object_hook Flask's cookie serializer hands to json.loads.
+    if isinstance(value, dict):
+        return _tagger.untag({key: _untag(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_untag(item) for item in value]
+    return value
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that only remembers its id and whether it changed; the data lives in the store."""
+
+    def __init__(self, initial=None, sid=None, expires_at=None, user_id=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.user_id = user_id
+        self.new = new  # the id has not been written to the store yet
+        self.modified = False
+        self.accessed = False
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class SQLSessionStore:
+    """Sessions in the ``server_session`` table, one row per session, indexed by user and expiry.
+
+    Works with the SQLite primary (or any SQLAlchemy URL); another backend only
+    needs the same five methods.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    @property
+    def table(self):
+        from models import ServerSession as ServerSessionRow
+        return ServerSessionRow.__table__
+
+    def load(self, sid, now):
+        with self.engine.connect() as conn:
+            row = conn.execute(sa.select(self.table.c.data, self.table.c.expires_at, self.table.c.user_id).where(
+                self.table.c.id == sid, self.table.c.expires_at > now)).first()
+        return tuple(row) if row else (None, None, None)
+
+    def save(self, sid, user_id, data, expires_at, new):
+        """Insert a newly issued ``sid`` or update an existing one; False if it no longer exists.
+
+        An existing session is never re-created: one revoked or swept while a
+        request was using it stays gone.
+        """
+        values = {'user_id': user_id, 'data': data, 'expires_at': expires_at}
+        with self.engine.begin() as conn:
+            if new:
+                conn.execute(self.table.insert().values(id=sid, **values))
+                return True
+            return bool(conn.execute(self.table.update().where(self.table.c.id == sid).values(**values)).rowcount)
+
+    def delete(self, sid):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.id == sid))
+
+    def delete_user(self, user_id):
+        with self.engine.begin() as conn:
+            return conn.execute(self.table.delete().where(self.table.c.user_id == user_id)).rowcount
+
+    def sweep(self, now):
+        with self.engine.begin() as conn:
+            return conn.execute(self.table.delete().where(self.table.c.expires_at <= now)).rowcount
+
+
+class ServerSessionInterface(SessionInterface):
+    """Keeps only a random session id in the cookie and the session itself in ``store``.
+
+    The store is written only when the session changed, or when less than half
+    of its lifetime is left so that active users do not expire. Expired rows
+    are removed by a background sweeper instead of on the request path.
+    """
+
+    def __init__(self, store, sweep_interval=300):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._sweeper_pid = None
+        self._lock = threading.Lock()
+
+    def open_session(self, app, request):
+        self._ensure_sweeper()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            blob, expires_at, user_id = self.store.load(sid, time.time())
+            if blob is not None:
+                try:
+                    return ServerSession(loads(blob), sid=sid, expires_at=expires_at, user_id=user_id)
+                except Exception:
+                    log.warning('discarding unreadable session %s', sid[:8], exc_info=True)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.modified and session.sid:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        stale = session.expires_at is None or session.expires_at - now < lifetime / 2
+        if not session.modified and not stale:
+            return
+
+        login_id = session.get('_user_id')
+        user_id = login_id.partition(':')[0] if login_id else None  # "<uuid>:<epoch>", see User.get_id
+        if session.sid is not None and user_id != session.user_id:
+            self.store.delete(session.sid)  # new id on login/logout, so a planted id is useless
+            session.sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+            session.new = True
+        session.expires_at = now + lifetime
+        if not self.store.save(session.sid, user_id, dumps(dict(session)), session.expires_at, session.new):
+            # Revoked while this request ran: let the browser forget it too
+            response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                   samesite=samesite, httponly=httponly)
+            response.vary.add('Cookie')
+            return
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=httponly, domain=domain, path=path, secure=secure, samesite=samesite)
+        response.vary.add('Cookie')
+
+    def _ensure_sweeper(self):
+        if self._sweeper_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sweeper_pid != os.getpid():
+                self._sweeper_pid = os.getpid()
+                threading.Thread(target=self._sweep_forever, name='session-sweeper', daemon=True).start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                removed = self.store.sweep(time.time())
+            except Exception:
+                log.exception('session sweep failed')
+            else:
+                if removed:
+                    log.info('swept %d expired sessions', removed)
+
+
+def revoke_user_sessions(user_id):
+    """Sign ``user_id`` out everywhere; returns how many stored sessions were deleted.
+
+    Bumping the user's session epoch invalidates every login id issued so far,
+    which covers "remember me" cookies and cookie-store sessions; stored
+    sessions are also deleted in one indexed delete.
+    """
+    from models import User
+
+    user_id = uuid.UUID(str(user_id))
+    wait_write(submit_write(lambda session: session.query(User).filter_by(id=user_id).update(
+        {'session_epoch': User.session_epoch + 1}), user_id=user_id))
+    interface = current_app.session_interface
+    if isinstance(interface, ServerSessionInterface):
+        return interface.store.delete_user(str(user_id))
+    return 0
+
+
+def init_sessions(app):
+    if app.config['SESSION_STORE'] == 'sql':
+        with app.app_context():
+            store = SQLSessionStore(db.engines[None])
+        app.session_interface = ServerSessionInterface(store, app.config['SESSION_SWEEP_INTERVAL'])
@@ -0,0 +1,329 @@
+import hashlib
+import threading
+import time
+import uuid
+
+import click
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db
+
+
+SHARD_PREFIX = 'shard_'
+BUCKETS = 256  # users hash into fixed buckets; rebalancing moves whole buckets between shards
+
+
+def bucket_for(user_id):
+    if not isinstance(user_id, uuid.UUID):
+        user_id = uuid.UUID(str(user_id))
+    return int.from_bytes(hashlib.blake2b(user_id.bytes, digest_size=8).digest(), 'big') % BUCKETS
+
+
+class ShardMoving(Exception):
+    """A write for a user whose bucket is frozen while ``flask shards rebalance`` moves it."""
+
+
+def _user_key(table):
+    return table.c.user_id if 'user_id' in table.c else table.c.id
+
+
+class ShardMap:
+    """Bucket -> shard assignment, persisted in ``shard_bucket`` and cached per worker for SHARD_MAP_TTL.
+
+    Buckets marked moving are readable on their current shard but refuse writes.
+    """
+
+    def __init__(self, shards, ttl):
+        self.shards = shards
+        self.ttl = ttl
+        self._buckets = None
+        self._moving = frozenset()
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def default(self):
+        return [bucket % self.shards for bucket in range(BUCKETS)]
+
+    def buckets(self):
+        self._refresh()
+        return self._buckets
+
+    def moving(self):
+        self._refresh()
+        return self._moving
+
+    def _refresh(self):
+        if self._buckets is None or time.monotonic() - self._loaded_at > self.ttl:
+            with self._lock:
+                self._buckets, self._moving = self.load() or (self.default(), frozenset())
+                self._loaded_at = time.monotonic()
+
+    def load(self):
+        """``(buckets, moving buckets)`` as persisted, or None before `flask shards init`."""
+        from models import ShardBucket
+
+        table = ShardBucket.__table__
+        with db.engines[None].connect() as conn:
+            if not sa.inspect(conn).has_table(table.name):
+                return None
+            rows = conn.execute(sa.select(table.c.bucket, table.c.shard, table.c.moving)).all()
+        if len(rows) != BUCKETS:
+            return None
+        buckets = [0] * BUCKETS
+        for bucket, shard, _ in rows:
+            buckets[bucket] = shard
+        return buckets, frozenset(bucket for bucket, _, moving in rows if moving)
+
+    def save(self, buckets, moving=()):
+        from models import ShardBucket
+
+        table = ShardBucket.__table__
+        with db.engines[None].begin() as conn:
+            conn.execute(table.delete())
+            conn.execute(table.insert(), [{'bucket': b, 'shard': s, 'moving': b in moving}
+                                          for b, s in enumerate(buckets)])
+        self._buckets = list(buckets)
+        self._moving = frozenset(moving)
+        self._loaded_at = time.monotonic()
+
+    def shard_for(self, user_id, write=False):
+        bucket = bucket_for(user_id)
+        if write and bucket in self.moving():
+            raise ShardMoving(f'bucket {bucket} is being moved to another shard')
+        return f'{SHARD_PREFIX}{self.buckets()[bucket]}'
+
+
+def sharding_enabled():
+    return 'sharding' in current_app.extensions
+
+
+def shard_for(user_id, write=False):
+    """Bind key of the shard holding ``user_id``, or None when users are not sharded.
+
+    With ``write``, raises ShardMoving while a rebalance has the user's bucket frozen.
+    """
+    state = current_app.extensions.get('sharding')
+    return state['map'].shard_for(user_id, write) if state is not None else None
+
+
+def use_shard(user_id, session=None, write=False):
+    """Point ``db.session`` (or ``session``) at the shard holding ``user_id`` for user-owned tables."""
+    session = session or db.session
+    session.info['shard'] = shard_for(user_id, write)
+
+
+def shard_engine(session, mapper, clause):
+    """Engine for a statement on a sharded table, or None if the statement is not on one."""
+    state = current_app.extensions.get('sharding')
+    if state is None:
+        return None
+    if mapper is not None:
+        table = sa.inspect(mapper).local_table
+    elif isinstance(clause, sa.Table):
+        table = clause
+    elif isinstance(clause, sa.UpdateBase):
+        table = clause.table
+    else:
+        return None
+    if table.name not in state['tables']:
+        return None
+    key = session.info.get('shard')
+    if key is None:
+        raise sa.exc.UnboundExecutionError(
+            f"Query on sharded table '{table.name}' without a shard; look users up with find_user() "
+            f"or call use_shard() first")
+    return db.engines[key]
+
+
+def find_user(**criteria):
+    """Fetch a ``User`` by ``id``, ``username`` or ``email``.
+
+    With sharding on, username and email go through the global directory and
+    the user row is then read straight from its shard; an id skips the directory.
+    """
+    from models import User, UserDirectory
+
+    if not sharding_enabled():
+        return User.query.filter_by(**criteria).first()
+
+    user_id = criteria.pop('id', None)
+    if user_id is None:
+        entry = UserDirectory.query.filter_by(**criteria).first()
+        if entry is None:
+            return None
+        user_id = entry.user_id
+    use_shard(user_id)
+    return db.session.get(User, user_id)
+
+
+def claim_directory_entry(user_id, username, email):
+    """Reserve ``username`` and ``email`` for ``user_id`` in the directory; no-op without sharding."""
+    from models import UserDirectory
+
+    if sharding_enabled():
+        db.session.add(UserDirectory(user_id=user_id, username=username, email=email))
+        db.session.commit()
+
+
+def release_directory_entry(user_id):
+    from models import UserDirectory
+
+    if sharding_enabled():
+        db.session.rollback()
+        UserDirectory.query.filter_by(user_id=user_id).delete()
+        db.session.commit()
+
+
+def _copied_columns(table):
+    # Integer ids of collection rows are only unique per shard: leave them out
+    # and let the destination number the rows
+    return [c for c in table.columns if not c.primary_key or c is _user_key(table)]
+
+
+def _copy_users(tables, src, dst, user_ids):
+    """Upsert every row owned by ``user_ids`` from ``src`` into ``dst``, parents first.
+
+    Collection rows get new ids on ``dst``, so the users' ``collections_version``
+    is bumped there: an edit based on ids read before the move is refused
+    instead of landing on the wrong row.
+    """
+    with src.connect() as source, dst.begin() as target:
+        for table in tables:
+            key = _user_key(table)
+            query = sa.select(*_copied_columns(table)).where(key.in_(user_ids))
+            rows = [row._asdict() for row in source.execute(query)]
+            target.execute(table.delete().where(key.in_(user_ids)))
+            if rows:
+                target.execute(table.insert(), rows)
+            if 'collections_version' in table.c:
+                target.execute(table.update().where(key.in_(user_ids)).values(
+                    collections_version=table.c.collections_version + 1))
+
+
+def _delete_users(tables, engine, user_ids):
+    with engine.begin() as conn:
+        for table in reversed(tables):
+            conn.execute(table.delete().where(_user_key(table).in_(user_ids)))
+
+
+def _bucket_users(engine, buckets):
+    users = db.metadata.tables['user']
+    with engine.connect() as conn:
+        return [row.id for row in conn.execute(sa.select(users.c.id)) if bucket_for(row.id) in buckets]
+
+
+def rebalance(shards, settle, chunk=500, echo=print):
+    """Move buckets so bucket ``b`` lives on shard ``b % shards``, without stopping the app.
+
+    Buckets move one (old shard, new shard) pair at a time. The pair's buckets
+    are first frozen: reads go on as before, writes fail with ShardMoving (a
+    503). After ``settle`` seconds (at least SHARD_MAP_TTL, so every worker
+    has picked up the freeze) the old shard is scanned for the users now in
+    those buckets, they are copied, and the map is flipped and unfrozen in one
+    save. Once all pairs have moved and another ``settle`` has passed, the
+    copies left on shards that no longer own their bucket are deleted. A run
+    that stopped half way leaves its buckets frozen until it is run again.
+    """
+    state = current_app.extensions['sharding']
+    shard_map = state['map']
+    tables = [t for t in db.metadata.sorted_tables if t.name in state['tables']]
+
+    current = list(shard_map.buckets())
+    target = [bucket % shards for bucket in range(BUCKETS)]
+    moves = {}
+    for bucket, (old, new) in enumerate(zip(current, target)):
+        if old != new:
+            moves.setdefault((old, new), set()).add(bucket)
+    if not moves:
+        echo('Shards already balanced.')
+
+    for (old, new), buckets in sorted(moves.items()):
+        src, dst = db.engines[f'{SHARD_PREFIX}{old}'], db.engines[f'{SHARD_PREFIX}{new}']
+        shard_map.save(current, moving=buckets)
+        echo(f'shard {old} -> {new}: {len(buckets)} buckets frozen for writes, waiting {settle:g}s')
+        time.sleep(settle)
+        ids = _bucket_users(src, buckets)
+        for start in range(0, len(ids), chunk):
+            _copy_users(tables, src, dst, ids[start:start + chunk])
+        for bucket in buckets:
+            current[bucket] = new
+        shard_map.save(current)
+        echo(f'shard {old} -> {new}: {len(buckets)} buckets, {len(ids)} users copied')
+
+    if moves:
+        time.sleep(settle)
+    for shard in range(len(current_app.config['SQLALCHEMY_SHARD_URIS'])):
+        engine = db.engines[f'{SHARD_PREFIX}{shard}']
+        ids = _bucket_users(engine, {bucket for bucket in range(BUCKETS) if current[bucket] != shard})
+        for start in range(0, len(ids), chunk):
+            _delete_users(tables, engine, ids[start:start + chunk])
+        if ids:
+            echo(f'shard {shard}: {len(ids)} moved users removed')
+
+
+def init_sharding(app):
+    """Register SQLALCHEMY_SHARD_URIS as ``shard_<n>`` binds; must run before ``db.init_app``."""
+    uris = app.config['SQLALCHEMY_SHARD_URIS']
+    if not uris:
+        return
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for i, uri in enumerate(uris):
+        binds[f'{SHARD_PREFIX}{i}'] = uri
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.extensions['sharding'] = {
+        'map': ShardMap(len(uris), app.config['SHARD_MAP_TTL']),
+        'tables': set(),  # filled in by register_sharded_models once models are imported
+    }
+
+    @app.errorhandler(ShardMoving)
+    def shard_moving(e):
+        return ('This account is being moved, please try again in a minute.', 503,
+                {'Retry-After': str(app.config['SHARD_MAP_TTL'])})
+
+    @app.cli.group()
+    def shards():
+        """Hash-sharded user storage."""
+
+    @shards.command('init')
+    def init():
+        """Create the directory on the primary, user tables on every shard, and persist the bucket map."""
+        state = app.extensions['sharding']
+        db.metadata.create_all(db.engines[None], tables=[
+            t for t in db.metadata.sorted_tables if t.name not in state['tables']])
+        sharded = [t for t in db.metadata.sorted_tables if t.name in state['tables']]
+        for i in range(len(uris)):
+            db.metadata.create_all(db.engines[f'{SHARD_PREFIX}{i}'], tables=sharded)
+        if state['map'].load() is None:
+            state['map'].save(state['map'].default())
+        click.echo(f'{len(uris)} shards ready.')
+
+    @shards.command('status')
+    def status():
+        """Show buckets and users per shard."""
+        shard_map = app.extensions['sharding']['map']
+        buckets, moving = shard_map.buckets(), shard_map.moving()
+        users = db.metadata.tables['user']
+        for i in range(len(uris)):
+            with db.engines[f'{SHARD_PREFIX}{i}'].connect() as conn:
+                count = conn.execute(sa.select(sa.func.count()).select_from(users)).scalar()
+            frozen = sum(1 for bucket in moving if buckets[bucket] == i)
+            click.echo(f'shard {i}: {buckets.count(i)} buckets, {count} users'
+                       + (f', {frozen} buckets frozen' if frozen else ''))
+
+    @shards.command('rebalance')
+    @click.option('--shards', 'count', type=int, default=None, help='Spread buckets over the first N shards.')
+    @click.option('--settle', type=float, default=None, help='Seconds to wait before the catch-up copy.')
+    def rebalance_command(count, settle):
+        """Move buckets between shards while the app keeps serving."""
+        count = count or len(uris)
+        if not 0 < count <= len(uris):
+            raise click.BadParameter(f'expected 1..{len(uris)}', param_hint='--shards')
+        rebalance(count, settle if settle is not None else app.config['SHARD_MAP_TTL'], echo=click.echo)
+
+
+def register_sharded_models(app, models):
+    """Mark the tables of ``models`` as living on the user shards."""
+    state = app.extensions.get('sharding')
+    if state is not None:
+        state['tables'].update(model.__table__.name for model in models)
@@ -0,0 +1,91 @@
+import os
+import threading
+from collections import OrderedDict
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    """Bounded LRU store for rendered template fragments, shared by all requests in a worker."""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds a ``{% cache 'name', key_part, ... %}...{% endcache %}`` block to Jinja.
+
+    The rendered body is stored under the joined key parts, so per-user fragments
+    just add ``current_user.get_id()`` to the key. Without a cache on the
+    environment the body is rendered every time.
+    """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render_cached', [nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = ':'.join(str(part) for part in parts)
+        rv = cache.get(key)
+        if rv is None:
+            rv = caller()
+            cache.set(key, rv)
+        return rv
+
+
+def init_templating(app):
+    """Attach the on-disk bytecode cache and the fragment cache to the app's Jinja environment."""
+    env = app.jinja_env
+    if app.config['TEMPLATE_BYTECODE_CACHE']:
+        # Workers share the directory; entries are keyed by template checksum so a
+        # deploy with changed templates recompiles them once and reuses them after.
+        cache_dir = app.config['TEMPLATE_BYTECODE_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja_bytecode')
+        os.makedirs(cache_dir, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    env.add_extension(FragmentCacheExtension)
+    size = app.config['TEMPLATE_FRAGMENT_CACHE_SIZE']
+    env.fragment_cache = FragmentCache(size) if size else None
@@ -0,0 +1,213 @@
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.orm import Session
+
+from app import db
+from app.routing import stick_to_primary
+from app.sharding import shard_for, use_shard
+
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Funnels mutations through one writer thread that commits them in batches.
+
+    Callers submit a function taking a session; the writer runs as many queued
+    functions as it can gather (up to ``max_batch``, waiting at most ``max_delay``
+    seconds for stragglers) inside one transaction, so a burst of sign-ups costs
+    one lock acquisition and one fsync instead of one each. If one job in the
+    batch fails (an IntegrityError, a bug in the function) the batch is rolled
+    back and every job is retried in its own transaction, so one bad write only
+    fails its own future. An OperationalError (the lock wait timing out, a full
+    disk) fails the whole batch instead: it is not the fault of any one job, and
+    retrying them one by one would only wait out the busy timeout again for
+    each. Jobs aimed at different binds (shards) are committed in one
+    transaction per bind.
+    """
+
+    def __init__(self, engines, max_batch=64, max_delay=0.005):
+        self.engines = engines
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.jobs = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, bind_key=None):
+        future = Future()
+        self._ensure_started()
+        self._queue.put((fn, future, bind_key))
+        return future
+
+    def stop(self, timeout=None):
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _ensure_started(self):
+        # Started on first use, and again in a forked child, which does not inherit threads.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def _gather(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get(timeout=self.max_delay)
+            except queue.Empty:
+                break
+            if job is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._gather()
+            if batch is None:
+                return
+            by_bind = {}
+            for fn, future, bind_key in batch:
+                if future.set_running_or_notify_cancel():
+                    by_bind.setdefault(bind_key, []).append((fn, future))
+            for bind_key, jobs in by_bind.items():
+                self._commit(jobs, bind_key)
+
+    def _commit(self, batch, bind_key):
+        results = []
+        try:
+            engine = self.engines[bind_key].execution_options(sqlite_immediate=True)
+            with Session(engine, expire_on_commit=False) as session, session.begin():
+                for fn, _ in batch:
+                    results.append(fn(session))
+        except sa.exc.OperationalError as e:
+            log.error('write batch of %d failed', len(batch), exc_info=True)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            log.warning('write batch of %d failed, retrying jobs one by one', len(batch), exc_info=True)
+            for job in batch:
+                self._commit([job], bind_key)
+            return
+        self.batches += 1
+        self.jobs += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+def configure_sqlite(engine, busy_timeout, wal=True):
+    """Let SQLite writers from every process queue for the lock instead of failing.
+
+    Each connection waits up to ``busy_timeout`` seconds for a lock held by
+    another connection (or process) and, with ``wal``, uses the write-ahead log
+    so readers never block the writer. Connections with the ``sqlite_immediate``
+    execution option open their transaction with BEGIN IMMEDIATE, taking the
+    write lock up front: a transaction that reads before it writes otherwise
+    only asks for the lock halfway through, and if another connection committed
+    in between SQLite fails it at once instead of waiting. Other connections
+    keep pysqlite's default of running reads outside a transaction.
+    """
+    @sa.event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout * 1000)}')
+        if wal:
+            cursor.execute('PRAGMA journal_mode = WAL')
+        cursor.close()
+
+    @sa.event.listens_for(engine, 'begin')
+    def begin(conn):
+        if conn.get_execution_options().get('sqlite_immediate'):
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def init_write_queue(app):
+    with app.app_context():
+        engines = dict(db.engines)
+    for engine in engines.values():
+        if engine.dialect.name == 'sqlite':
+            configure_sqlite(engine, app.config['SQLITE_BUSY_TIMEOUT'], app.config['SQLITE_WAL'])
+    if app.config['WRITE_QUEUE_ENABLED']:
+        app.extensions['write_queue'] = WriteQueue(
+            engines,
+            max_batch=app.config['WRITE_QUEUE_MAX_BATCH'],
+            max_delay=app.config['WRITE_QUEUE_MAX_DELAY'],
+        )
+
+
+def submit_write(fn, user_id=None):
+    """Run ``fn(session)`` and commit it, returning a future with ``fn``'s return value.
+
+    With WRITE_QUEUE_ENABLED the write goes through the app's single writer
+    thread; otherwise it runs and commits on ``db.session`` right away. ``fn``
+    should return plain values such as ids, not instances bound to the session.
+    Pass ``user_id`` for writes to user-owned tables so they reach that user's shard.
+    """
+    bind_key = shard_for(user_id, write=True) if user_id is not None else None
+    write_queue = current_app.extensions.get('write_queue')
+    if write_queue is not None:
+        stick_to_primary()  # the writer's own session commits, not db.session
+        return write_queue.submit(fn, bind_key)
+
+    future = Future()
+    try:
+        if bind_key is not None:
+            use_shard(user_id)
+        if not db.session().in_transaction():
+            db.session.connection(bind_arguments={'bind': db.engines[bind_key]},
+                                  execution_options={'sqlite_immediate': True})
+        result = fn(db.session)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+    return future
+
+
+def wait_write(future, timeout=None):
+    """The result of a ``submit_write`` future, waiting at most WRITE_TIMEOUT seconds for it.
+
+    A write still queued at the deadline is cancelled and TimeoutError raised.
+    One the writer has already started gets up to SQLITE_BUSY_TIMEOUT seconds
+    more, the longest its transaction can wait for the lock, before
+    TimeoutError is raised anyway; only a write stuck past that can still
+    commit after its caller gave up.
+    """
+    if timeout is None:
+        timeout = current_app.config['WRITE_TIMEOUT']
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        if future.cancel():
+            raise
+    return future.result(current_app.config['SQLITE_BUSY_TIMEOUT'])
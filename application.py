@@ -1 +1,12 @@
-from app import create_app
\ No newline at end of file
+"""WSGI entry point. The app is built and warmed at import, so under a
+preloading server every worker shares it copy-on-write:
+
+    gunicorn --preload --workers 4 application:app
+
+It always runs the prod profile; use `flask run` for the others.
+"""
+from app import create_app
+from app.preload import preload
+from config import get_config
+
+app = preload(create_app(get_config('prod')))
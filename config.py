@@ -6,9 +6,117 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = 'sqlite:///site.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Read-only queries are spread over these binds; writes and reads after a write use the primary.
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.environ.get('SQLALCHEMY_REPLICA_URIS', '').split(',') if uri]
+    REPLICA_STICKY_SECONDS = 10
+    # User-owned tables are spread over these binds by a hash of the user UUID (see `flask shards`).
+    SQLALCHEMY_SHARD_URIS = [uri for uri in os.environ.get('SQLALCHEMY_SHARD_URIS', '').split(',') if uri]
+    SHARD_MAP_TTL = 30  # seconds a worker trusts its cached bucket -> shard map
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = os.environ.get('MAIL_PORT')
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS')
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
-    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
\ No newline at end of file
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
+    # 'cookie' keeps Flask's signed cookie session; 'sql' stores sessions server-side
+    # in the server_session table so they can be revoked per user.
+    SESSION_STORE = os.environ.get('SESSION_STORE', 'cookie')
+    SESSION_SWEEP_INTERVAL = 300  # seconds between deletes of expired sessions
+
+    # Reset mails are handed to a background outbox instead of being sent inside the request.
+    MAIL_OUTBOX_ENABLED = True
+    MAIL_OUTBOX_CONCURRENCY = 4  # SMTP conversations in flight per worker
+    MAIL_OUTBOX_RETRIES = 3  # further attempts after a failed send, 2, 4 and 8 seconds apart
+    MAIL_OUTBOX_RETRY_DELAY = 2.0
+    MAIL_OUTBOX_DRAIN_TIMEOUT = 30.0  # seconds an exiting worker waits for queued mail
+
+    # Extensions that only help during development are switched on per profile.
+    DEBUG_TOOLBAR = False
+    SQLALCHEMY_RECORD_QUERIES = False
+
+    # Compiled templates are kept on disk (instance/jinja_bytecode unless set) and
+    # rendered {% cache %} fragments in a per-worker LRU of this many entries.
+    TEMPLATE_BYTECODE_CACHE = True
+    TEMPLATE_BYTECODE_CACHE_DIR = os.environ.get('TEMPLATE_BYTECODE_CACHE_DIR')
+    TEMPLATE_FRAGMENT_CACHE_SIZE = 512
+
+    # Serve the output of `flask assets build` (fingerprinted, precompressed) when present.
+    STATIC_FINGERPRINT = True
+
+    # Send mutations through one writer thread that commits them in batches,
+    # instead of every request committing against the SQLite lock on its own.
+    WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    WRITE_QUEUE_MAX_BATCH = 64
+    WRITE_QUEUE_MAX_DELAY = 0.005  # seconds the writer waits for more jobs to join a batch
+    WRITE_TIMEOUT = 10  # seconds a request waits for its write before giving up
+    # One writer thread per process still leaves several processes contending for
+    # the SQLite lock: wait for it instead of failing with "database is locked".
+    SQLITE_BUSY_TIMEOUT = 15  # seconds
+    SQLITE_WAL = True
+
+    # Auth events are buffered in memory and flushed in batches to the auth_event
+    # table, or to rotating JSON-lines segments under EVENT_LOG_DIR (instance/events).
+    EVENT_LOG_ENABLED = True
+    EVENT_LOG_SINK = os.environ.get('EVENT_LOG_SINK', 'table')  # 'table' or 'segments'
+    EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR')
+    EVENT_LOG_SEGMENT_BYTES = 64 * 1024 * 1024
+    EVENT_LOG_CAPACITY = 10000  # events held in memory before new ones are dropped
+    EVENT_LOG_BATCH_SIZE = 500
+    EVENT_LOG_FLUSH_INTERVAL = 1.0  # seconds
+
+    # Soft-deleted accounts go to one compressed archived_user record each
+    # ('archive', see `flask archive`) or are copied into the deleted_* tables ('tables').
+    DELETED_USER_STORE = os.environ.get('DELETED_USER_STORE', 'archive')
+
+    # Failed-login limits count per client address: behind a reverse proxy set
+    # PROXY_FIX_X_FOR to the number of proxies so that address comes from
+    # X-Forwarded-For, and point RATELIMIT_STORAGE_URI at a shared store
+    # (redis://...) so every worker counts against the same limit.
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+
+    PROFILE_COLLECTION_MAX_ITEMS = 100  # items accepted per PUT /api/profile/<collection>
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    DEBUG_TOOLBAR = True
+    SQLALCHEMY_RECORD_QUERIES = True
+    TEMPLATE_FRAGMENT_CACHE_SIZE = 0  # template edits should show up on reload
+    STATIC_FINGERPRINT = False  # so should stylesheet edits
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'testing')
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    WTF_CSRF_ENABLED = False
+    RATELIMIT_ENABLED = False
+    MAIL_SUPPRESS_SEND = True
+    MAIL_OUTBOX_ENABLED = False  # send inline so tests can record outgoing mail
+    TEMPLATE_BYTECODE_CACHE = False
+    TEMPLATE_FRAGMENT_CACHE_SIZE = 0
+    STATIC_FINGERPRINT = False
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+    SESSION_STORE = os.environ.get('SESSION_STORE', 'sql')
+
+
+# Profiles selectable through the APP_CONFIG environment variable.
+config_by_name = {
+    'dev': DevelopmentConfig,
+    'test': TestingConfig,
+    'prod': ProductionConfig,
+}
+
+
+def get_config(name=None):
+    # Production unless told otherwise: dev turns on DEBUG and the debug toolbar,
+    # which must never be served to clients by accident.
+    name = name or os.environ.get('APP_CONFIG', 'prod')
+    try:
+        return config_by_name[name]
+    except KeyError:
+        raise ValueError(f"Unknown config profile '{name}', expected one of {sorted(config_by_name)}")
@@ -0,0 +1,59 @@
+"""Alembic environment: runs migrations against the app's primary database or one of its binds.
+
+Every database (primary and each user shard) runs the same revision chain, so
+user tables on the primary simply stay empty when users are sharded.
+"""
+from logging.config import fileConfig
+
+import sqlalchemy as sa
+from alembic import context
+
+from app import create_app, db
+import models  # noqa: F401  registers every table on db.metadata
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+bind_key = context.get_x_argument(as_dictionary=True).get('bind')
+target_metadata = db.metadata
+
+# DDL gives up after this long instead of queueing logins behind its lock.
+LOCK_TIMEOUT = '5s'
+
+
+def compare_type(context, inspected_column, metadata_column, inspected_type, metadata_type):
+    # SQLite has no UUID type and reflects those columns as NUMERIC; don't report that as a change.
+    if context.dialect.name == 'sqlite' and isinstance(metadata_type, sa.Uuid):
+        return False
+    return None
+
+
+def run_migrations_offline():
+    app = create_app()
+    with app.app_context():
+        url = db.engines[bind_key].url
+    context.configure(url=url, target_metadata=target_metadata, literal_binds=True,
+                      render_as_batch=url.get_backend_name() == 'sqlite', compare_type=compare_type)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    app = create_app()
+    with app.app_context(), db.engines[bind_key].connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+        # One transaction per revision keeps DDL locks short and lets a backfill
+        # revision see the columns added by the one before it.
+        context.configure(connection=connection, target_metadata=target_metadata,
+                          render_as_batch=connection.dialect.name == 'sqlite',
+                          compare_type=compare_type, transaction_per_migration=True)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,163 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+The tables as db.create_all() made them before migrations were introduced;
+such a database is brought under Alembic with `alembic stamp 0001`.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('deleted_user',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('username', sa.String(length=20), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('phone_number', sa.String(length=20), nullable=False),
+    sa.Column('password_hash', sa.String(length=60), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('user',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('username', sa.String(length=20), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('phone_number', sa.String(length=20), nullable=False),
+    sa.Column('password_hash', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('address',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('street_address', sa.String(length=100), nullable=False),
+    sa.Column('city', sa.String(length=50), nullable=False),
+    sa.Column('state', sa.String(length=50), nullable=False),
+    sa.Column('zip_code', sa.String(length=20), nullable=False),
+    sa.Column('country', sa.String(length=50), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('deleted_address',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('street_address', sa.String(length=100), nullable=False),
+    sa.Column('city', sa.String(length=50), nullable=False),
+    sa.Column('state', sa.String(length=50), nullable=False),
+    sa.Column('zip_code', sa.String(length=20), nullable=False),
+    sa.Column('country', sa.String(length=50), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['deleted_user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('deleted_education_history',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('institution_name', sa.String(length=100), nullable=False),
+    sa.Column('degree', sa.String(length=50), nullable=False),
+    sa.Column('graduation_date', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['deleted_user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('deleted_skill',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('skill_name', sa.String(length=50), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['deleted_user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('deleted_social_profile',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('platform', sa.String(length=50), nullable=False),
+    sa.Column('profile_url', sa.String(length=200), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['deleted_user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('deleted_user_profile',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('first_name', sa.String(length=50), nullable=False),
+    sa.Column('last_name', sa.String(length=50), nullable=False),
+    sa.Column('date_of_birth', sa.Date(), nullable=False),
+    sa.Column('bio', sa.Text(), nullable=True),
+    sa.Column('hobbies', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['deleted_user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('deleted_work_experience',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('company_name', sa.String(length=100), nullable=False),
+    sa.Column('position_title', sa.String(length=100), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['deleted_user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('education_history',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('institution_name', sa.String(length=100), nullable=False),
+    sa.Column('degree', sa.String(length=50), nullable=False),
+    sa.Column('graduation_date', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('skill',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('skill_name', sa.String(length=50), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('social_profile',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('platform', sa.String(length=50), nullable=False),
+    sa.Column('profile_url', sa.String(length=200), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('user_profile',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('first_name', sa.String(length=50), nullable=False),
+    sa.Column('last_name', sa.String(length=50), nullable=False),
+    sa.Column('date_of_birth', sa.Date(), nullable=False),
+    sa.Column('bio', sa.Text(), nullable=True),
+    sa.Column('hobbies', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('work_experience',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('company_name', sa.String(length=100), nullable=False),
+    sa.Column('position_title', sa.String(length=100), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('work_experience')
+    op.drop_table('user_profile')
+    op.drop_table('social_profile')
+    op.drop_table('skill')
+    op.drop_table('education_history')
+    op.drop_table('deleted_work_experience')
+    op.drop_table('deleted_user_profile')
+    op.drop_table('deleted_social_profile')
+    op.drop_table('deleted_skill')
+    op.drop_table('deleted_education_history')
+    op.drop_table('deleted_address')
+    op.drop_table('address')
+    op.drop_table('user')
+    op.drop_table('deleted_user')
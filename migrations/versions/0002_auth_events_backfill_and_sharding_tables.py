@@ -0,0 +1,64 @@
+"""auth events, backfill progress and sharding tables
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('auth_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ts', sa.Float(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('user_id', sa.UUID(as_uuid=False), nullable=True),
+    sa.Column('ip', sa.String(length=45), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('auth_event', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_auth_event_ts'), ['ts'], unique=False)
+
+    op.create_table('backfill_progress',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('last_key', sa.String(length=100), nullable=True),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('finished', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('shard_bucket',
+    sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket')
+    )
+    op.create_table('user_directory',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('username', sa.String(length=20), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_directory')
+    op.drop_table('shard_bucket')
+    op.drop_table('backfill_progress')
+    with op.batch_alter_table('auth_event', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_auth_event_ts'))
+
+    op.drop_table('auth_event')
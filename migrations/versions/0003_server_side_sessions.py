@@ -0,0 +1,42 @@
+"""server-side sessions
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('server_session',
+    sa.Column('id', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.String(length=36), nullable=True),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('server_session', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_server_session_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_server_session_user_id'), ['user_id'], unique=False)
+
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('server_session', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_server_session_user_id'))
+        batch_op.drop_index(batch_op.f('ix_server_session_expires_at'))
+
+    op.drop_table('server_session')
@@ -0,0 +1,90 @@
+"""collection row ids and version
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+Skills, work experience, education and social links were keyed by user_id
+alone, allowing one row per user. Each of these tables (and its deleted_*
+mirror) is rebuilt with an integer id as primary key and an index on user_id.
+Primary keys cannot be altered in place on SQLite, so every table is copied
+into a new one that then takes its name.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table):
+    return {
+        'social_profile': lambda: [
+            sa.Column('platform', sa.String(length=50), nullable=False),
+            sa.Column('profile_url', sa.String(length=200), nullable=False),
+        ],
+        'education_history': lambda: [
+            sa.Column('institution_name', sa.String(length=100), nullable=False),
+            sa.Column('degree', sa.String(length=50), nullable=False),
+            sa.Column('graduation_date', sa.Date(), nullable=True),
+        ],
+        'work_experience': lambda: [
+            sa.Column('company_name', sa.String(length=100), nullable=False),
+            sa.Column('position_title', sa.String(length=100), nullable=False),
+            sa.Column('start_date', sa.Date(), nullable=False),
+            sa.Column('end_date', sa.Date(), nullable=True),
+        ],
+        'skill': lambda: [
+            sa.Column('skill_name', sa.String(length=50), nullable=False),
+        ],
+    }[table]()
+
+
+TABLES = [(prefix + table, prefix + 'user') for table in ('social_profile', 'education_history',
+                                                          'work_experience', 'skill')
+          for prefix in ('', 'deleted_')]
+
+
+def _rebuild(name, parent, with_id, where=''):
+    columns = _columns(name.removeprefix('deleted_'))
+    copied = ', '.join(['user_id'] + [c.name for c in columns])
+    if with_id:
+        keys = [sa.Column('id', sa.Integer(), nullable=False),
+                sa.Column('user_id', sa.UUID(), nullable=False)]
+        primary_key = sa.PrimaryKeyConstraint('id')
+    else:
+        keys = [sa.Column('user_id', sa.UUID(), nullable=False)]
+        primary_key = sa.PrimaryKeyConstraint('user_id')
+    op.create_table(f'_new_{name}', *keys, *columns,
+                    sa.ForeignKeyConstraint(['user_id'], [f'{parent}.id'], ),
+                    primary_key)
+    op.execute(f'INSERT INTO _new_{name} ({copied}) SELECT {copied} FROM {name}{where}')
+    op.drop_table(name)
+    op.rename_table(f'_new_{name}', name)
+    if with_id:
+        op.create_index(op.f(f'ix_{name}_user_id'), name, ['user_id'], unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('collections_version', sa.Integer(), server_default='0', nullable=False))
+    for name, parent in TABLES:
+        _rebuild(name, parent, with_id=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema. Only the first row of each user's collections is kept."""
+    for name, parent in TABLES:
+        op.drop_index(op.f(f'ix_{name}_user_id'), table_name=name)
+        _rebuild(name, parent, with_id=False,
+                 where=f' WHERE id IN (SELECT MIN(id) FROM {name} GROUP BY user_id)')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('collections_version')
@@ -1,17 +1,26 @@
-# run this in an interactive python shell to create the database tables:
-# from app import app, db
-# with app.app_context():
-#     db.create_all()
+# the schema is managed by Alembic, create or update the database tables with:
+#   alembic upgrade head
+# a database created earlier with db.create_all() is brought under Alembic with:
+#   alembic stamp 0001
 
 from app import db, bcrypt, login_manager
+from app.events import record_event, ACCOUNT_DELETED
+from app.sharding import find_user, use_shard, release_directory_entry
+from flask import current_app
 from flask_login import UserMixin
 import uuid
 from uuid import uuid4
 
 
 @login_manager.user_loader
-def load_user(user_uuid):
-    return User.query.get(uuid.UUID(user_uuid))
+def load_user(login_id):
+    # The login id also names the user's session epoch (see User.get_id), so
+    # sessions and "remember me" cookies issued before a revoke stop loading.
+    user_uuid, _, epoch = login_id.partition(':')
+    user = find_user(id=uuid.UUID(user_uuid))
+    if user is None or str(user.session_epoch) != epoch:
+        return None
+    return user
 login_manager.user_loader(load_user)
 
 class User(UserMixin, db.Model):
@@ -21,6 +30,14 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     phone_number = db.Column(db.String(20), nullable=False)
     password_hash = db.Column(db.String(100), nullable=False)
+    # Bumped by every bulk edit of skills, work, education or social links (optimistic locking)
+    collections_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Bumped by app.sessions.revoke_user_sessions; part of the login id, see get_id
+    session_epoch = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def get_id(self):
+        # Stored in the session and signed into the "remember me" cookie as "<uuid>:<epoch>"
+        return f'{self.id}:{self.session_epoch or 0}'
 
     @property
     def password(self):
@@ -64,20 +81,23 @@ class UserProfile(db.Model):
 
 class SocialProfile(db.Model):
     __tablename__ = 'social_profile'
-    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, primary_key=True)  # This will be set to user.id
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, index=True)  # This will be set to user.id
     platform = db.Column(db.String(50), nullable=False)
     profile_url = db.Column(db.String(200), nullable=False)
 
 class EducationHistory(db.Model):
     __tablename__ = 'education_history'
-    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, primary_key=True)  # This will be set to user.id
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, index=True)  # This will be set to user.id
     institution_name = db.Column(db.String(100), nullable=False)
     degree = db.Column(db.String(50), nullable=False)
     graduation_date = db.Column(db.Date, nullable=True)
 
 class WorkExperience(db.Model):
     __tablename__ = 'work_experience'
-    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, primary_key=True)  # This will be set to user.id
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, index=True)  # This will be set to user.id
     company_name = db.Column(db.String(100), nullable=False)
     position_title = db.Column(db.String(100), nullable=False)
     start_date = db.Column(db.Date, nullable=False)
@@ -85,7 +105,8 @@ class WorkExperience(db.Model):
 
 class Skill(db.Model):
     __tablename__ = 'skill'
-    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, primary_key=True)  # This will be set to user.id
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, index=True)  # This will be set to user.id
     skill_name = db.Column(db.String(50), nullable=False)
 
 
@@ -128,20 +149,23 @@ class DeletedUserProfile(db.Model):
 
 class DeletedSocialProfile(db.Model):
     __tablename__ = 'deleted_social_profile'
-    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('deleted_user.id'), nullable=False, primary_key=True)  # This will be set to deleted_user.id
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('deleted_user.id'), nullable=False, index=True)  # This will be set to deleted_user.id
     platform = db.Column(db.String(50), nullable=False)
     profile_url = db.Column(db.String(200), nullable=False)
 
 class DeletedEducationHistory(db.Model):
     __tablename__ = 'deleted_education_history'
-    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('deleted_user.id'), nullable=False, primary_key=True)  # This will be set to deleted_user.id
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('deleted_user.id'), nullable=False, index=True)  # This will be set to deleted_user.id
     institution_name = db.Column(db.String(100), nullable=False)
     degree = db.Column(db.String(50), nullable=False)
     graduation_date = db.Column(db.Date, nullable=True)
 
 class DeletedWorkExperience(db.Model):
     __tablename__ = 'deleted_work_experience'
-    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('deleted_user.id'), nullable=False, primary_key=True)  # This will be set to deleted_user.id
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('deleted_user.id'), nullable=False, index=True)  # This will be set to deleted_user.id
     company_name = db.Column(db.String(100), nullable=False)
     position_title = db.Column(db.String(100), nullable=False)
     start_date = db.Column(db.Date, nullable=False)
@@ -149,10 +173,69 @@ class DeletedWorkExperience(db.Model):
 
 class DeletedSkill(db.Model):
     __tablename__ = 'deleted_skill'
-    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('deleted_user.id'), nullable=False, primary_key=True)  # This will be set to deleted_user.id
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('deleted_user.id'), nullable=False, index=True)  # This will be set to deleted_user.id
     skill_name = db.Column(db.String(50), nullable=False)
 
 
+class UserDirectory(db.Model):
+    """Global username/email -> user id index, kept on the primary when users are sharded."""
+    __tablename__ = 'user_directory'
+    user_id = db.Column(db.UUID(as_uuid=True), primary_key=True, nullable=False)
+    username = db.Column(db.String(20), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+
+class ShardBucket(db.Model):
+    """Which shard each hash bucket of user ids lives on."""
+    __tablename__ = 'shard_bucket'
+    bucket = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    shard = db.Column(db.Integer, nullable=False)
+    moving = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # writes refused
+
+
+class AuthEvent(db.Model):
+    """Append-only log of logins, failed logins, resets and deletions, written in batches by app.events."""
+    __tablename__ = 'auth_event'
+    id = db.Column(db.Integer, primary_key=True)
+    ts = db.Column(db.Float, nullable=False, index=True)  # unix time
+    kind = db.Column(db.String(20), nullable=False)
+    user_id = db.Column(db.UUID(as_uuid=False), nullable=True)
+    ip = db.Column(db.String(45), nullable=True)
+
+
+class BackfillProgress(db.Model):
+    """Resume point of each named app.backfill run, committed together with the chunk it covers."""
+    __tablename__ = 'backfill_progress'
+    name = db.Column(db.String(100), primary_key=True)
+    last_key = db.Column(db.String(100), nullable=True)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    finished = db.Column(db.Boolean, nullable=False, default=False)
+
+
+class ServerSession(db.Model):
+    """Server-side session store used by app.sessions; the cookie only carries ``id``."""
+    __tablename__ = 'server_session'
+    id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.String(36), nullable=True, index=True)  # flask_login's _user_id, for revoking
+    data = db.Column(db.LargeBinary, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)  # unix time
+
+
+class ArchivedUser(db.Model):
+    """A soft-deleted account's whole graph as one compressed record, written by app.archive."""
+    __tablename__ = 'archived_user'
+    user_id = db.Column(db.UUID(as_uuid=True), primary_key=True, nullable=False)
+    archived_at = db.Column(db.Float, nullable=False)  # unix time
+    data = db.Column(db.LargeBinary, nullable=False)
+
+
+# Every table keyed by a user's UUID; with sharding on these live on the user's shard.
+SHARDED_MODELS = (
+    User, Address, UserProfile, SocialProfile, EducationHistory, WorkExperience, Skill,
+    DeletedUser, DeletedAddress, DeletedUserProfile, DeletedSocialProfile,
+    DeletedEducationHistory, DeletedWorkExperience, DeletedSkill, ArchivedUser,
+)
+
 
 def soft_delete_generic(user_model, user_id, deleted_model_map):
     """
@@ -162,8 +245,15 @@ def soft_delete_generic(user_model, user_id, deleted_model_map):
     :param user_id: The ID of the record that needs to be deleted.
     :param deleted_model_map: A dictionary mapping original models to their corresponding deleted models.
     """
-    # Fetch the instance
-
+    if user_model is User and current_app.config['DELETED_USER_STORE'] == 'archive':
+        # One compressed record instead of a row in every deleted_* table
+        from app.archive import archive_user
+        if not archive_user(user_id):
+            return None, f"{user_model.__name__} not found"
+        return None
+
+    # Fetch the instance, from the user's shard when users are sharded
+    use_shard(user_id, write=True)
     user_instance = db.session.query(user_model).get(uuid.UUID(user_id))
     if not user_instance:
         return None, f"{user_model.__name__} not found"
@@ -190,10 +280,13 @@ def soft_delete_generic(user_model, user_id, deleted_model_map):
         if relationship.uselist:  # One-to-many relationships
             related_instances = getattr(user_instance, rel_name)
             deleted_related_model = deleted_model_map.get(relationship.mapper.entity, None)
+            # Row ids are left for deleted_* to assign; they are only unique within one table
+            related_columns = [column.key for column in relationship.mapper.columns
+                               if not column.primary_key or column.key == 'user_id']
 
             for instance in related_instances:
                 new_deleted_instance = deleted_related_model()
-                for column in columns:
+                for column in related_columns:
                     setattr(new_deleted_instance, column, getattr(instance, column))
                 db.session.add(new_deleted_instance)
         else:  # One-to-one relationships
@@ -201,7 +294,7 @@ def soft_delete_generic(user_model, user_id, deleted_model_map):
             if related_instance is not None:
                 deleted_related_model = deleted_model_map.get(relationship.mapper.entity, None)
                 new_deleted_instance = deleted_related_model()
-                for column in columns:
+                for column in (column.key for column in relationship.mapper.columns):
                     setattr(new_deleted_instance, column, getattr(related_instance, column))
                 db.session.add(new_deleted_instance)
 
@@ -211,6 +304,8 @@ def soft_delete_generic(user_model, user_id, deleted_model_map):
     # Delete the original record
     db.session.delete(user_instance)
     db.session.commit()
+    release_directory_entry(uuid.UUID(user_id))
+    record_event(ACCOUNT_DELETED, user_id)
 
 # Example of calling the soft_delete_generic function
 #
@@ -0,0 +1,147 @@
+"""Compare soft-deleted account storage: deleted_* tables vs the compressed archive.
+
+    python scripts/bench_archive.py [--users 2000] [--sample 500]
+
+--users accounts with address, profile, skill, work, education and social rows
+are soft-deleted into a fresh SQLite file per layout. Reports deletes per second,
+bytes used by the deleted accounts (tables and indexes, after VACUUM), point
+lookups of a deleted account per second and, for the archive, restores per second.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date
+
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'bench-archive')
+
+from app import create_app, db  # noqa: E402
+from app.archive import load_archived, restore_user  # noqa: E402
+from config import TestingConfig  # noqa: E402
+from models import (  # noqa: E402
+    User, Address, UserProfile, SocialProfile, EducationHistory, WorkExperience, Skill,
+    DeletedUser, DeletedAddress, DeletedUserProfile, DeletedSocialProfile,
+    DeletedEducationHistory, DeletedWorkExperience, DeletedSkill, soft_delete_generic,
+)
+
+DELETED_MODEL_MAP = {
+    User: DeletedUser,
+    Address: DeletedAddress,
+    SocialProfile: DeletedSocialProfile,
+    EducationHistory: DeletedEducationHistory,
+    WorkExperience: DeletedWorkExperience,
+    Skill: DeletedSkill,
+    UserProfile: DeletedUserProfile,
+}
+FIRST = ['Alice', 'Bob', 'Carol', 'Dave', 'Erin', 'Frank', 'Grace', 'Heidi']
+LAST = ['Smith', 'Jones', 'Garcia', 'Miller', 'Davis', 'Lopez', 'Wilson', 'Moore']
+SKILLS = ['python', 'sql', 'design', 'sales', 'writing', 'accounting']
+
+
+def populate(users):
+    ids = [uuid.uuid4() for _ in range(users)]
+    rows = {table: [] for table in ('user', 'address', 'user_profile', 'skill', 'work_experience',
+                                    'education_history', 'social_profile')}
+    for i, user_id in enumerate(ids):
+        first, last = random.choice(FIRST), random.choice(LAST)
+        name = f'{first.lower()}{i}'
+        rows['user'].append({'id': user_id, 'username': name, 'email': f'{name}@example.com',
+                             'phone_number': f'555-{i:04d}', 'password_hash': '$2b$12$' + os.urandom(27).hex()[:53]})
+        rows['address'].append({'user_id': user_id, 'street_address': f'{i} Main St', 'city': 'Springfield',
+                                'state': 'IL', 'zip_code': f'{62700 + i % 100}', 'country': 'US'})
+        rows['user_profile'].append({'user_id': user_id, 'first_name': first, 'last_name': last,
+                                     'date_of_birth': date(1960 + i % 40, 1 + i % 12, 1 + i % 28),
+                                     'bio': None, 'hobbies': None})
+        rows['skill'].append({'user_id': user_id, 'skill_name': random.choice(SKILLS)})
+        rows['work_experience'].append({'user_id': user_id, 'company_name': 'Acme Corp', 'position_title': 'Engineer',
+                                        'start_date': date(2015, 1, 1), 'end_date': None})
+        rows['education_history'].append({'user_id': user_id, 'institution_name': 'State University',
+                                          'degree': 'BSc', 'graduation_date': date(2012, 6, 1)})
+        rows['social_profile'].append({'user_id': user_id, 'platform': 'github',
+                                       'profile_url': f'https://github.com/{name}'})
+    with db.engine.begin() as conn:
+        for table, values in rows.items():
+            conn.execute(db.metadata.tables[table].insert(), values)
+    return ids
+
+
+def deleted_bytes(tables):
+    """Bytes of ``tables`` and their indexes, from SQLite's dbstat table."""
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('VACUUM')
+        rows = conn.exec_driver_sql(
+            'SELECT s.tbl_name, SUM(d.pgsize) FROM dbstat d JOIN sqlite_schema s ON s.name = d.name '
+            'GROUP BY s.tbl_name').all()
+    return sum(size for name, size in rows if name in tables)
+
+
+def read_deleted_tables(user_id):
+    with db.engine.connect() as conn:
+        for model in DELETED_MODEL_MAP.values():
+            table = model.__table__
+            key = table.c.user_id if 'user_id' in table.c else table.c.id
+            conn.execute(sa.select(table).where(key == user_id)).all()
+
+
+def run(store, users, sample, path):
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        DELETED_USER_STORE = store
+        EVENT_LOG_ENABLED = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        ids = populate(users)
+
+        started = time.perf_counter()
+        for user_id in ids:
+            soft_delete_generic(User, str(user_id), DELETED_MODEL_MAP)
+            db.session.remove()
+        deletes = users / (time.perf_counter() - started)
+
+        if store == 'archive':
+            size = deleted_bytes({'archived_user'})
+            lookup = load_archived
+        else:
+            size = deleted_bytes({model.__tablename__ for model in DELETED_MODEL_MAP.values()})
+            lookup = read_deleted_tables
+
+        picked = random.sample(ids, min(sample, users))
+        started = time.perf_counter()
+        for user_id in picked:
+            lookup(user_id)
+        lookups = len(picked) / (time.perf_counter() - started)
+
+        restores = None
+        if store == 'archive':
+            started = time.perf_counter()
+            for user_id in picked:
+                restore_user(user_id)
+            restores = len(picked) / (time.perf_counter() - started)
+    return deletes, size, lookups, restores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--sample', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'layout':<16}{'deletes/s':>11}{'bytes':>12}{'bytes/account':>15}{'lookups/s':>11}{'restores/s':>12}")
+    for name, store in (('deleted_* rows', 'tables'), ('archive', 'archive')):
+        random.seed(0)
+        with tempfile.TemporaryDirectory() as tmp:
+            deletes, size, lookups, restores = run(store, args.users, args.sample, os.path.join(tmp, 'bench.db'))
+        restores = f'{restores:.1f}' if restores is not None else '-'
+        print(f"{name:<16}{deletes:>11.1f}{size:>12}{size / args.users:>15.1f}{lookups:>11.1f}{restores:>12}")
+
+
+if __name__ == '__main__':
+    main()
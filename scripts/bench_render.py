@@ -0,0 +1,68 @@
+"""Report render time per page with and without the template caches.
+
+    python scripts/bench_render.py [--requests 300]
+
+"cold" is the first render in a fresh worker (template compile or bytecode load),
+"warm" the mean of the following renders.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'bench-render')
+
+from app import create_app  # noqa: E402
+from config import TestingConfig  # noqa: E402
+
+PAGES = {
+    'main.index': '/',
+    'auth.login': '/login',
+    'registration.register': '/registration',
+}
+
+
+def make_config(bytecode_dir, fragments):
+    class BenchConfig(TestingConfig):
+        TEMPLATE_BYTECODE_CACHE = bytecode_dir is not None
+        TEMPLATE_BYTECODE_CACHE_DIR = bytecode_dir
+        TEMPLATE_FRAGMENT_CACHE_SIZE = 512 if fragments else 0
+    return BenchConfig
+
+
+def bench(config, requests):
+    results = {}
+    for page, url in PAGES.items():
+        client = create_app(config).test_client()
+        started = time.perf_counter()
+        client.get(url)
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(requests):
+            client.get(url)
+        results[page] = (cold, (time.perf_counter() - started) / requests)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as bytecode_dir:
+        bench(make_config(bytecode_dir, True), 1)  # populate the bytecode cache, as a deploy's first worker would
+        variants = {
+            'no caches': make_config(None, False),
+            'bytecode cache': make_config(bytecode_dir, False),
+            'bytecode + fragments': make_config(bytecode_dir, True),
+        }
+        print(f"{'variant':<22}{'page':<24}{'cold':>10}{'warm':>10}")
+        for name, config in variants.items():
+            for page, (cold, warm) in bench(config, args.requests).items():
+                print(f"{name:<22}{page:<24}{cold * 1000:>8.2f}ms{warm * 1000:>8.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Concurrent password-reset throughput at a fixed worker count, inline mail vs the outbox.
+
+    python scripts/bench_reset.py [--workers 4] [--requests 40] [--smtp-delay 0.3]
+
+A local SMTP sink that waits --smtp-delay seconds before accepting each message
+stands in for a slow relay. --workers threads play the part of the server's
+request workers.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'bench-reset')
+
+from app import create_app, db  # noqa: E402
+from config import TestingConfig  # noqa: E402
+from models import User  # noqa: E402
+
+
+def start_slow_smtp(delay):
+    """Start a minimal SMTP server in a thread, returning its port and a received-message counter."""
+    received = [0]
+
+    async def handle(reader, writer):
+        writer.write(b'220 bench ready\r\n')
+        while line := await reader.readline():
+            command = line[:4].upper()
+            if command == b'DATA':
+                writer.write(b'354 go ahead\r\n')
+                while (await reader.readline()) != b'.\r\n':
+                    pass
+                await asyncio.sleep(delay)
+                received[0] += 1
+                writer.write(b'250 queued\r\n')
+            elif command == b'QUIT':
+                writer.write(b'221 bye\r\n')
+                break
+            else:
+                writer.write(b'250 ok\r\n')
+            await writer.drain()
+        writer.close()
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    loop = asyncio.new_event_loop()
+
+    async def serve():
+        server = await asyncio.start_server(handle, sock=sock)
+        await server.serve_forever()
+
+    threading.Thread(target=lambda: loop.run_until_complete(serve()), daemon=True).start()
+    return sock.getsockname()[1], received
+
+
+def run(outbox, workers, requests, port, path):
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        MAIL_SERVER = '127.0.0.1'
+        MAIL_PORT = port
+        MAIL_USE_TLS = False
+        MAIL_SUPPRESS_SEND = False
+        MAIL_DEFAULT_SENDER = 'bench@example.com'
+        MAIL_OUTBOX_ENABLED = outbox
+        MAIL_OUTBOX_CONCURRENCY = 16
+        EVENT_LOG_ENABLED = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@example.com', phone_number='1', password_hash='x'))
+        db.session.commit()
+
+    def reset(_):
+        started = time.perf_counter()
+        app.test_client().post('/reset_request', data={'email': 'bench@example.com'})
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        latencies = sorted(pool.map(reset, range(requests)))
+    return requests / (time.perf_counter() - started), latencies[len(latencies) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--smtp-delay', type=float, default=0.3)
+    args = parser.parse_args()
+
+    port, received = start_slow_smtp(args.smtp_delay)
+    print(f"{'mode':<10}{'resets/s':>10}{'p50 latency':>14}")
+    for name, outbox in (('inline', False), ('outbox', True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            rate, p50 = run(outbox, args.workers, args.requests, port, os.path.join(tmp, 'bench.db'))
+        print(f"{name:<10}{rate:>10.1f}{p50 * 1000:>12.1f}ms")
+    time.sleep(args.smtp_delay * args.requests / 16 + 1)
+    print(f'messages accepted by the relay: {received[0]} of {2 * args.requests}')
+
+
+if __name__ == '__main__':
+    main()
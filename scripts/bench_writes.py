@@ -0,0 +1,119 @@
+"""Compare concurrent sign-up commits: direct db.session.commit() vs the single-writer queue.
+
+    python scripts/bench_writes.py [--processes 1] [--threads 16] [--signups 50]
+
+Each of --processes worker processes (its own app, like a pre-fork server's
+workers) runs --threads threads that each insert --signups users (with address
+and profile) into the same fresh SQLite file, recording the latency of every commit.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'bench-writes')
+
+from app import create_app, db  # noqa: E402
+from app.writer import submit_write  # noqa: E402
+from config import TestingConfig  # noqa: E402
+from models import User, Address, UserProfile  # noqa: E402
+
+
+def signup(session):
+    user_id = uuid.uuid4()
+    name = user_id.hex[:20]
+    session.add(User(id=user_id, username=name, email=f'{name}@example.com',
+                     phone_number='555-0100', password_hash='x' * 60))
+    session.add(Address(user_id=user_id, street_address='1 Main St', city='Springfield',
+                        state='IL', zip_code='62701', country='US'))
+    session.add(UserProfile(user_id=user_id, first_name='Bench', last_name='User',
+                            date_of_birth=date(1990, 1, 1)))
+    return user_id
+
+
+def config(path, queue_enabled):
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        WRITE_QUEUE_ENABLED = queue_enabled
+    return BenchConfig
+
+
+def worker_process(queue_enabled, threads, signups, path, results):
+    app = create_app(config(path, queue_enabled))
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker():
+        with app.app_context():
+            for _ in range(signups):
+                started = time.perf_counter()
+                try:
+                    submit_write(signup).result()
+                except Exception as e:
+                    with lock:
+                        errors.append(e)
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    write_queue = app.extensions.get('write_queue')
+    if write_queue is not None:
+        write_queue.stop()
+    batches = write_queue.batches if write_queue is not None else len(latencies)
+    results.put((latencies, [repr(e) for e in errors], batches))
+
+
+def run(queue_enabled, processes, threads, signups, path):
+    app = create_app(config(path, queue_enabled))
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    pool = [context.Process(target=worker_process, args=(queue_enabled, threads, signups, path, results))
+            for _ in range(processes)]
+    started = time.perf_counter()
+    for p in pool:
+        p.start()
+    outcomes = [results.get() for _ in pool]
+    elapsed = time.perf_counter() - started
+    for p in pool:
+        p.join()
+
+    latencies = sorted(latency for outcome in outcomes for latency in outcome[0])
+    errors = [error for outcome in outcomes for error in outcome[1]]
+    if errors:
+        print(f'  first error: {errors[0]}', file=sys.stderr)
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else float('nan')
+    return len(latencies) / elapsed, p99, len(errors), sum(outcome[2] for outcome in outcomes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--signups', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'mode':<14}{'sign-ups/s':>12}{'p99 commit':>13}{'errors':>8}{'transactions':>14}")
+    for name, queue_enabled in (('direct', False), ('write queue', True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            rate, p99, errors, batches = run(queue_enabled, args.processes, args.threads, args.signups, os.path.join(tmp, 'bench.db'))
+        print(f"{name:<14}{rate:>12.1f}{p99 * 1000:>11.2f}ms{errors:>8}{batches:>14}")
+
+
+if __name__ == '__main__':
+    main()
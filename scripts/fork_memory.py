@@ -0,0 +1,125 @@
+"""Report shared vs private memory per forked worker, with and without preloading the app.
+
+    python scripts/fork_memory.py [--workers 4] [--requests 3000] [--profile prod]
+
+Each mode runs in a fresh interpreter that forks --workers children the way a
+pre-fork server does. Every child serves --requests anonymous page views
+through the test client, then reads its own /proc/self/smaps_rollup (Linux).
+Rate limiting is off and the database is a scratch SQLite file, so every
+request renders its page.
+
+  per-worker app  each child imports and builds the app after the fork
+  fork            the master builds the app, children inherit it as is
+  preload         the master also runs app.preload.preload() (warm-up, gc.freeze)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA = r'''
+import sys
+from app import create_app, db
+from config import get_config
+app = create_app(type('Probe', (get_config(sys.argv[1]),), {'SQLALCHEMY_DATABASE_URI': sys.argv[2]}))
+with app.app_context():
+    db.create_all()
+'''
+
+PROBE = r'''
+import json, os, sys
+mode, profile, workers, requests, uri = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), sys.argv[5]
+PAGES = ['/', '/index', '/registration', '/login', '/reset_request']
+
+
+def build():
+    from app import create_app
+    from config import get_config
+    # Unlimited, so every request renders its page instead of a 429
+    return create_app(type('Probe', (get_config(profile),), {'RATELIMIT_ENABLED': False,
+                                                             'SQLALCHEMY_DATABASE_URI': uri}))
+
+
+def memory():
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0])
+    return {
+        'rss': fields['Rss'], 'pss': fields['Pss'],
+        'shared': fields['Shared_Clean'] + fields['Shared_Dirty'],
+        'private': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+
+app = None
+if mode != 'per-worker app':
+    app = build()
+    if mode == 'preload':
+        from app.preload import preload
+        preload(app)
+
+children = []
+for _ in range(workers):
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        worker_app = app or build()
+        client = worker_app.test_client()
+        statuses = [client.get(PAGES[i % len(PAGES)]).status_code for i in range(requests)]
+        os.write(write_end, json.dumps(dict(memory(), errors=sum(s != 200 for s in statuses))).encode())
+        os._exit(0)
+    os.close(write_end)
+    children.append((pid, read_end))
+
+results = []
+for pid, read_end in children:
+    with os.fdopen(read_end) as f:
+        results.append(json.loads(f.read()))
+    os.waitpid(pid, 0)
+errors = sum(result.pop('errors') for result in results)
+if errors:
+    sys.exit(f'{errors} requests did not return 200')
+print(json.dumps(results))
+'''
+
+MODES = ('per-worker app', 'fork', 'preload')
+
+
+def env():
+    return dict(os.environ, SECRET_KEY=os.environ.get('SECRET_KEY', 'fork-memory'))
+
+
+def measure(mode, profile, workers, requests, uri):
+    out = subprocess.run([sys.executable, '-c', PROBE, mode, profile, str(workers), str(requests), uri],
+                         cwd=ROOT, env=env(), capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--profile', default='prod')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f"sqlite:///{os.path.join(tmp, 'fork-memory.db')}"
+        subprocess.run([sys.executable, '-c', SCHEMA, args.profile, uri], cwd=ROOT, env=env(), check=True)
+        print(f"{'mode':<16}{'rss':>10}{'pss':>10}{'shared':>10}{'private':>10}   (MB, mean per worker)")
+        for mode in MODES:
+            results = measure(mode, args.profile, args.workers, args.requests, uri)
+            mean = {key: sum(r[key] for r in results) / len(results) / 1024 for key in results[0]}
+            print(f"{mode:<16}{mean['rss']:>10.1f}{mean['pss']:>10.1f}"
+                  f"{mean['shared']:>10.1f}{mean['private']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
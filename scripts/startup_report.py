@@ -0,0 +1,63 @@
+"""Report worker cold-start time and per-request overhead for each config profile.
+
+Every profile is measured in a fresh interpreter so module import cost is included:
+
+    python scripts/startup_report.py [--requests 200]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+from config import get_config
+# Rate limits would turn most of the timed requests into 429s
+app = create_app(type('Probe', (get_config(sys.argv[1]),), {'RATELIMIT_ENABLED': False}))
+cold_start = time.perf_counter() - started
+client = app.test_client()
+client.get('/')  # first request pays for template compilation
+n = int(sys.argv[2])
+started = time.perf_counter()
+for _ in range(n):
+    client.get('/')
+per_request = (time.perf_counter() - started) / n
+print(json.dumps({
+    'cold_start_ms': cold_start * 1000,
+    'create_app_ms': app.extensions['startup_report']['total'] * 1000,
+    'modules': len(sys.modules),
+    'mail_loaded': 'flask_mail' in sys.modules,
+    'jwt_loaded': 'jwt' in sys.modules,
+    'per_request_ms': per_request * 1000,
+}))
+'''
+
+
+def measure(profile, requests):
+    env = dict(os.environ, SECRET_KEY=os.environ.get('SECRET_KEY', 'startup-report'))
+    out = subprocess.run([sys.executable, '-c', PROBE, profile, str(requests)],
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--profiles', nargs='+', default=['dev', 'test', 'prod'])
+    args = parser.parse_args()
+
+    print(f"{'profile':<8}{'cold start':>12}{'create_app':>12}{'modules':>9}{'mail':>6}{'jwt':>5}{'per request':>13}")
+    for profile in args.profiles:
+        r = measure(profile, args.requests)
+        print(f"{profile:<8}{r['cold_start_ms']:>10.1f}ms{r['create_app_ms']:>10.1f}ms{r['modules']:>9}"
+              f"{'yes' if r['mail_loaded'] else 'no':>6}{'yes' if r['jwt_loaded'] else 'no':>5}"
+              f"{r['per_request_ms']:>11.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
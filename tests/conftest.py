@@ -0,0 +1,35 @@
+import pytest
+
+from app import create_app, db
+from config import TestingConfig
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build apps on SQLite files under ``tmp_path``; keyword arguments override TestingConfig.
+
+    ``uri(name)`` gives the URI of another database file in the same directory.
+    """
+    apps = []
+    metadatas = set(db.metadatas)
+
+    def make(**overrides):
+        overrides.setdefault('SQLALCHEMY_DATABASE_URI', uri('primary'))
+        app = create_app(type('Config', (TestingConfig,), overrides))
+        apps.append(app)
+        return app
+
+    def uri(name):
+        return f'sqlite:///{tmp_path / name}.db'
+
+    make.uri = uri
+    yield make
+    for app in apps:
+        write_queue = app.extensions.get('write_queue')
+        if write_queue is not None:
+            write_queue.stop()
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+    for key in set(db.metadatas) - metadatas:
+        del db.metadatas[key]  # each bind (replica, shard) registers one on the shared db
@@ -0,0 +1,89 @@
+import gzip
+
+import pytest
+from flask import url_for
+
+from app.assets import IMMUTABLE, build_assets, clean_assets, init_assets
+
+STYLES = 'body { color: #333; }\n' * 50
+
+
+@pytest.fixture
+def static(tmp_path):
+    folder = tmp_path / 'static'
+    (folder / 'css').mkdir(parents=True)
+    (folder / 'css' / 'main.css').write_text(STYLES)
+    (folder / 'robots.txt').write_text('User-agent: *\n')
+    return folder
+
+
+@pytest.fixture
+def make_assets_app(make_app, static):
+    def make():
+        app = make_app(STATIC_FINGERPRINT=True)
+        app.static_folder = str(static)
+        init_assets(app)  # again, now that the static folder holds a build
+        return app
+    return make
+
+
+def static_url(app, filename):
+    with app.test_request_context():
+        return url_for('static', filename=filename)
+
+
+def test_fingerprinted_asset_is_served_precompressed(static, make_assets_app):
+    manifest = build_assets(str(static))
+    app = make_assets_app()
+    url = static_url(app, 'css/main.css')
+    assert url == f"/static/{manifest['css/main.css']}"
+    response = app.test_client().get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Cache-Control'] == IMMUTABLE
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data).decode() == STYLES
+
+
+def test_encoding_refused_with_q0_is_not_sent(static, make_assets_app):
+    build_assets(str(static))
+    app = make_assets_app()
+    response = app.test_client().get(static_url(app, 'css/main.css'),
+                                     headers={'Accept-Encoding': 'gzip;q=0, br;q=0'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.data.decode() == STYLES
+
+
+def test_files_of_an_earlier_build_are_still_served(static, make_assets_app):
+    old = build_assets(str(static))['css/main.css']
+    (static / 'css' / 'main.css').write_text(STYLES + 'a { color: red; }\n')
+    new = build_assets(str(static))['css/main.css']
+    assert old != new
+    app = make_assets_app()
+    assert static_url(app, 'css/main.css') == f'/static/{new}'
+    response = app.test_client().get(f'/static/{old}')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE
+
+
+def test_clean_removes_only_earlier_builds(static, make_assets_app):
+    old = build_assets(str(static))['css/main.css']
+    (static / 'css' / 'main.css').write_text(STYLES + 'a { color: red; }\n')
+    new = build_assets(str(static))['css/main.css']
+    assert clean_assets(str(static)) == 2  # the old file and its .gz
+    assert not (static / 'dist' / old).exists()
+    assert (static / 'dist' / new).exists() and (static / 'dist' / f'{new}.gz').exists()
+    client = make_assets_app().test_client()
+    assert client.get(f'/static/{old}').status_code == 404
+    assert client.get(f'/static/{new}').status_code == 200
+    assert clean_assets(str(static)) == 0
+
+
+def test_unbuilt_files_and_the_manifest(static, make_assets_app):
+    build_assets(str(static))
+    client = make_assets_app().test_client()
+    response = client.get('/static/robots.txt')  # not fingerprinted by name, served from the source folder
+    assert response.status_code == 200 and response.headers['Cache-Control'] != IMMUTABLE
+    assert client.get('/static/dist/manifest.json').status_code == 404
+    assert client.get('/static/dist/./manifest.json').status_code == 404
@@ -0,0 +1,126 @@
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app import db
+from app.events import LOGIN, LOGIN_FAILED, EventLog, SegmentSink, _parse_time
+
+USER_ID = str(uuid.uuid4())
+
+
+class ListSink:
+    def __init__(self):
+        self.batches = []
+
+    def write(self, events):
+        self.batches.append(list(events))
+
+
+def test_parse_time_reads_naive_times_as_utc():
+    assert _parse_time('2026-10-19T12:00:00') == datetime(2026, 10, 19, 12, tzinfo=timezone.utc).timestamp()
+
+
+def test_parse_time_keeps_explicit_offsets():
+    assert _parse_time('2026-10-19T14:00:00+02:00') == _parse_time('2026-10-19T12:00:00')
+    assert _parse_time('2026-10-19T12:00:00Z') == _parse_time('2026-10-19T12:00:00')
+
+
+def test_parse_time_passes_none_through():
+    assert _parse_time(None) is None
+
+
+def test_full_buffer_drops_and_counts_new_events():
+    sink = ListSink()
+    event_log = EventLog(sink, capacity=3, batch_size=100, interval=60)
+    for i in range(5):
+        event_log.record(LOGIN, ip=f'10.0.0.{i}')
+    assert event_log.stats() == {'recorded': 3, 'flushed': 0, 'pending': 3, 'dropped': 2, 'failed': 0}
+    event_log.flush()
+    assert [event[3] for event in sink.batches[0]] == ['10.0.0.0', '10.0.0.1', '10.0.0.2']
+    event_log.record(LOGIN)  # room again once flushed
+    assert event_log.stats()['pending'] == 1
+
+
+def test_flush_writes_in_batches():
+    sink = ListSink()
+    event_log = EventLog(sink, capacity=100, batch_size=2, interval=60)
+    for _ in range(5):
+        event_log.record(LOGIN)
+    deadline = time.time() + 5
+    while event_log.stats()['pending'] > 1 and time.time() < deadline:
+        time.sleep(0.01)  # a full batch wakes the flusher before its interval is up
+    event_log.flush()
+    assert [len(batch) for batch in sink.batches] == [2, 2, 1]
+    assert event_log.stats()['flushed'] == 5
+
+
+def test_failed_flush_is_counted():
+    class BrokenSink:
+        def write(self, events):
+            raise OSError('disk full')
+
+    event_log = EventLog(BrokenSink(), batch_size=100, interval=60)
+    event_log.record(LOGIN)
+    event_log.flush()
+    assert event_log.stats()['failed'] == 1 and event_log.stats()['pending'] == 0
+
+
+def test_segments_rotate_past_max_bytes(tmp_path):
+    sink = SegmentSink(str(tmp_path), max_bytes=50)
+    events = [(1000.0 + i, LOGIN if i % 2 else LOGIN_FAILED, None, '10.0.0.1') for i in range(6)]
+    for i in range(0, 6, 2):
+        sink.write(events[i:i + 2])  # each batch is over 50 bytes
+    assert len(sink.segments()) == 3
+    assert list(sink.read()) == events
+    assert list(sink.read(since=1002.0, until=1005.0, kind=LOGIN)) == [events[3]]
+
+
+def test_each_process_writes_its_own_segment(tmp_path):
+    sink = SegmentSink(str(tmp_path), max_bytes=1024)
+    sink.write([(1000.0, LOGIN, None, str(os.getpid()))])
+    child = multiprocessing.get_context('fork').Process(target=sink.write,
+                                                        args=([(2000.0, LOGIN, None, 'child')],))
+    child.start()
+    child.join()
+    sink.write([(3000.0, LOGIN, None, str(os.getpid()))])
+    segments = sink.segments()
+    assert len(segments) == 2
+    assert {os.path.basename(path).rsplit('-', 1)[1] for path in segments} == {f'{os.getpid()}.jsonl',
+                                                                               f'{child.pid}.jsonl'}
+    assert sorted(event[0] for event in sink.read()) == [1000.0, 2000.0, 3000.0]
+
+
+@pytest.fixture(params=['table', 'segments'])
+def event_app(request, make_app, tmp_path):
+    app = make_app(EVENT_LOG_SINK=request.param, EVENT_LOG_DIR=str(tmp_path / 'events'))
+    with app.app_context():
+        db.create_all()
+    event_log = app.extensions['event_log']
+    event_log.record(LOGIN_FAILED, ip='10.0.0.1')
+    event_log.record(LOGIN, user_id=USER_ID, ip='10.0.0.1')
+    event_log.flush()
+    return app
+
+
+def test_export_jsonl(event_app):
+    result = event_app.test_cli_runner().invoke(args=['events', 'export', '--kind', LOGIN])
+    assert result.exit_code == 0, result.output
+    (line,) = result.output.splitlines()
+    assert {k: v for k, v in json.loads(line).items() if k != 'ts'} == {'kind': LOGIN, 'user_id': USER_ID,
+                                                                      'ip': '10.0.0.1'}
+
+
+def test_export_csv_time_range(event_app):
+    runner = event_app.test_cli_runner()
+    result = runner.invoke(args=['events', 'export', '--format', 'csv'])
+    assert result.exit_code == 0, result.output
+    header, *rows = result.output.splitlines()
+    assert header == 'ts,kind,user_id,ip'
+    assert [row.split(',')[1:] for row in rows] == [[LOGIN_FAILED, '', '10.0.0.1'], [LOGIN, USER_ID, '10.0.0.1']]
+    future = datetime.fromtimestamp(time.time() + 3600, tz=timezone.utc).isoformat()
+    assert runner.invoke(args=['events', 'export', '--since', future]).output == ''
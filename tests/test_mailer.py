@@ -0,0 +1,106 @@
+import sys
+import types
+
+import pytest
+from flask_mail import Message
+
+from app import get_mail
+from app.mailer import send_message
+
+
+def message():
+    return Message(subject='Password Reset Request', recipients=['bob@example.com'], body='your reset link is: x',
+                   sender='noreply@example.com')
+
+
+class StubSMTP(types.ModuleType):
+    """Stands in for aiosmtplib, failing the first ``failures`` sends."""
+
+    def __init__(self, failures=0):
+        super().__init__('aiosmtplib')
+        self.failures = failures
+        self.calls = []
+
+    async def send(self, message, **kwargs):
+        self.calls.append((message, kwargs))
+        if len(self.calls) <= self.failures:
+            raise ConnectionError('relay unavailable')
+
+
+@pytest.fixture
+def make_outbox_app(make_app):
+    def make(**overrides):
+        overrides = {'MAIL_OUTBOX_RETRY_DELAY': 0, **overrides}
+        return make_app(MAIL_OUTBOX_ENABLED=True, MAIL_DEFAULT_SENDER='noreply@example.com', **overrides)
+    return make
+
+
+def test_inline_send_without_outbox(make_app):
+    app = make_app(MAIL_DEFAULT_SENDER='noreply@example.com')
+    with app.app_context(), get_mail().record_messages() as outbox:
+        assert send_message(message()) is None
+        assert [m.recipients for m in outbox] == [['bob@example.com']]
+
+
+def test_thread_outbox_sends_through_flask_mail(make_outbox_app, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'aiosmtplib', None)  # not installed
+    app = make_outbox_app()
+    with app.app_context(), get_mail().record_messages() as outbox:
+        send_message(message()).result(5)
+        assert [m.subject for m in outbox] == ['Password Reset Request']
+    assert app.extensions['mail_outbox'].sent == 1
+
+
+def test_thread_outbox_retries_failed_sends(make_outbox_app, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'aiosmtplib', None)
+    app = make_outbox_app(MAIL_OUTBOX_RETRIES=2)
+    attempts = []
+
+    def flaky_send(msg):
+        attempts.append(msg)
+        if len(attempts) < 3:
+            raise ConnectionError('relay unavailable')
+
+    with app.app_context():
+        monkeypatch.setattr(get_mail(), 'send', flaky_send)
+        send_message(message()).result(5)
+        send_message(message()).result(5)
+    outbox = app.extensions['mail_outbox']
+    assert len(attempts) == 4
+    assert (outbox.sent, outbox.failed) == (2, 0)
+
+
+def test_async_outbox_sends_through_smtp_client(make_outbox_app, monkeypatch):
+    smtp = StubSMTP(failures=1)
+    monkeypatch.setitem(sys.modules, 'aiosmtplib', smtp)
+    app = make_outbox_app(MAIL_SUPPRESS_SEND=False, MAIL_SERVER='smtp.example.com', MAIL_PORT='587')
+    with app.app_context():
+        send_message(message()).result(5)
+    (_, first), (body, kwargs) = smtp.calls
+    assert first == kwargs
+    assert b'your reset link is: x' in body
+    assert kwargs['sender'] == 'noreply@example.com' and kwargs['recipients'] == ['bob@example.com']
+    assert (kwargs['hostname'], kwargs['port']) == ('smtp.example.com', 587)
+    assert app.extensions['mail_outbox'].sent == 1
+
+
+def test_async_outbox_gives_up_after_retries(make_outbox_app, monkeypatch):
+    smtp = StubSMTP(failures=10)
+    monkeypatch.setitem(sys.modules, 'aiosmtplib', smtp)
+    app = make_outbox_app(MAIL_SUPPRESS_SEND=False, MAIL_OUTBOX_RETRIES=2)
+    with app.app_context():
+        send_message(message()).result(5)
+    assert len(smtp.calls) == 3
+    assert app.extensions['mail_outbox'].failed == 1
+
+
+def test_drain_waits_for_queued_mail(make_outbox_app, monkeypatch):
+    smtp = StubSMTP(failures=2)
+    monkeypatch.setitem(sys.modules, 'aiosmtplib', smtp)
+    app = make_outbox_app(MAIL_SUPPRESS_SEND=False, MAIL_OUTBOX_RETRY_DELAY=0.05)
+    outbox = app.extensions['mail_outbox']
+    with app.app_context():
+        futures = [send_message(message()) for _ in range(3)]
+    assert outbox.drain(5)
+    assert all(future.done() for future in futures)
+    assert outbox.sent == 3 and not outbox._pending
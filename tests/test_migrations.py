@@ -0,0 +1,94 @@
+import uuid
+from datetime import date
+
+import pytest
+import sqlalchemy as sa
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+
+from app import db
+from config import TestingConfig
+
+
+def baseline_metadata():
+    """The tables db.create_all() made before the app had migrations."""
+    metadata = sa.MetaData()
+    for prefix in ('', 'deleted_'):
+        sa.Table(f'{prefix}user', metadata,
+                 sa.Column('id', sa.Uuid, primary_key=True),
+                 sa.Column('username', sa.String(20), unique=True, nullable=False),
+                 sa.Column('email', sa.String(120), unique=True, nullable=False),
+                 sa.Column('phone_number', sa.String(20), nullable=False),
+                 sa.Column('password_hash', sa.String(60 if prefix else 100), nullable=False))
+        children = {
+            'address': [('street_address', 100), ('city', 50), ('state', 50), ('zip_code', 20), ('country', 50)],
+            'user_profile': [('first_name', 50), ('last_name', 50), ('date_of_birth', sa.Date),
+                             ('bio', sa.Text, True), ('hobbies', sa.Text, True)],
+            'social_profile': [('platform', 50), ('profile_url', 200)],
+            'education_history': [('institution_name', 100), ('degree', 50), ('graduation_date', sa.Date, True)],
+            'work_experience': [('company_name', 100), ('position_title', 100), ('start_date', sa.Date),
+                                ('end_date', sa.Date, True)],
+            'skill': [('skill_name', 50)],
+        }
+        for name, columns in children.items():
+            sa.Table(f'{prefix}{name}', metadata,
+                     sa.Column('user_id', sa.Uuid, sa.ForeignKey(f'{prefix}user.id'), primary_key=True),
+                     *[sa.Column(column, sa.String(kind) if isinstance(kind, int) else kind, nullable=bool(rest))
+                       for column, kind, *rest in columns])
+    return metadata
+
+
+@pytest.fixture
+def alembic(tmp_path, monkeypatch):
+    uri = f'sqlite:///{tmp_path / "site.db"}'
+    monkeypatch.setenv('APP_CONFIG', 'test')
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', uri)
+    config = Config('alembic.ini')
+    config.attributes['uri'] = uri
+    return config
+
+
+def schema_differences(uri):
+    engine = sa.create_engine(uri)
+    with engine.connect() as conn:
+        context = MigrationContext.configure(conn, opts={'compare_type': False})
+        return compare_metadata(context, db.metadata)
+
+
+def test_revision_0001_is_the_baseline_schema(alembic):
+    command.upgrade(alembic, '0001')
+    engine = sa.create_engine(alembic.attributes['uri'])
+    with engine.connect() as conn:
+        tables = set(sa.inspect(conn).get_table_names()) - {'alembic_version'}
+    assert tables == set(baseline_metadata().tables)
+
+
+def test_stamped_baseline_database_upgrades_to_head(alembic):
+    engine = sa.create_engine(alembic.attributes['uri'])
+    baseline = baseline_metadata()
+    baseline.create_all(engine)
+    user_id = uuid.uuid4()
+    with engine.begin() as conn:
+        conn.execute(baseline.tables['user'].insert(), {
+            'id': user_id, 'username': 'bob', 'email': 'bob@example.com',
+            'phone_number': '555-0100', 'password_hash': 'x'})
+        conn.execute(baseline.tables['skill'].insert(), {'user_id': user_id, 'skill_name': 'python'})
+        conn.execute(baseline.tables['user_profile'].insert(), {
+            'user_id': user_id, 'first_name': 'Bob', 'last_name': 'Smith', 'date_of_birth': date(1990, 1, 1)})
+
+    command.stamp(alembic, '0001')
+    command.upgrade(alembic, 'head')
+
+    assert schema_differences(alembic.attributes['uri']) == []
+    with engine.connect() as conn:
+        assert conn.execute(sa.text('SELECT skill_name FROM skill')).scalars().all() == ['python']
+        assert conn.execute(sa.text('SELECT session_epoch FROM user')).scalar() == 0
+
+
+def test_downgrade_to_baseline_and_back(alembic):
+    command.upgrade(alembic, 'head')
+    command.downgrade(alembic, '0001')
+    command.upgrade(alembic, 'head')
+    assert schema_differences(alembic.attributes['uri']) == []
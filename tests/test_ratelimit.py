@@ -0,0 +1,31 @@
+import pytest
+
+from app import db
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(RATELIMIT_ENABLED=True, PROXY_FIX_X_FOR=1)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def attempt(client, address='203.0.113.1'):
+    return client.post('/login', data={'username': 'nobody', 'password': 'wrong'},
+                       headers={'X-Forwarded-For': address}).status_code
+
+
+def test_failed_logins_are_limited_per_client(app):
+    client = app.test_client()
+    assert [attempt(client) for _ in range(5)] == [200] * 5
+    assert attempt(client) == 429
+    assert attempt(client, '203.0.113.2') == 200  # another client behind the same proxy
+
+
+def test_get_is_not_limited(app):
+    client = app.test_client()
+    for _ in range(5):
+        attempt(client)
+    assert [client.get('/login').status_code for _ in range(10)] == [200] * 10
+    assert client.get('/reset_request').status_code == 200
@@ -0,0 +1,77 @@
+import time
+import uuid
+
+import pytest
+from flask import session as flask_session
+
+from app import db
+from app.routing import STICKY_KEY
+from models import User
+
+
+@pytest.fixture
+def app(make_app):
+    """A primary and one replica that have drifted apart: each holds a user the other lacks."""
+    app = make_app(SQLALCHEMY_REPLICA_URIS=[make_app.uri('replica')])
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines['replica_0'])
+        for bind_key, username in ((None, 'on_primary'), ('replica_0', 'on_replica')):
+            with db.engines[bind_key].begin() as conn:
+                conn.execute(User.__table__.insert(), {
+                    'id': uuid.uuid4(), 'username': username, 'email': f'{username}@example.com',
+                    'phone_number': '555-0100', 'password_hash': 'x'})
+    return app
+
+
+def read_from(username):
+    return User.query.filter_by(username=username).first() is not None
+
+
+def add_user(username):
+    db.session.add(User(username=username, email=f'{username}@example.com',
+                        phone_number='555-0100', password_hash='x'))
+
+
+def test_plain_read_goes_to_replica(app):
+    with app.app_context():
+        assert read_from('on_replica')
+        assert not read_from('on_primary')
+
+
+def test_reads_go_to_primary_after_flush(app):
+    with app.app_context():
+        assert read_from('on_replica')
+        add_user('new')
+        db.session.flush()
+        assert read_from('on_primary')
+        assert read_from('new')
+
+
+def test_reads_go_to_primary_after_commit(app):
+    with app.app_context():
+        add_user('new')
+        db.session.commit()
+        assert read_from('on_primary')
+        assert not read_from('on_replica')
+
+
+def test_commit_opens_sticky_window(app):
+    with app.test_request_context():
+        add_user('new')
+        db.session.commit()
+        assert flask_session[STICKY_KEY] > time.time()
+
+
+def test_reads_go_to_primary_while_sticky_window_is_open(app):
+    with app.test_request_context():
+        flask_session[STICKY_KEY] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+        assert read_from('on_primary')
+        assert not read_from('on_replica')
+
+
+def test_reads_return_to_replica_once_sticky_window_closes(app):
+    with app.test_request_context():
+        flask_session[STICKY_KEY] = time.time() - 1
+        assert read_from('on_replica')
+
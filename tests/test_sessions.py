@@ -0,0 +1,126 @@
+import time
+import uuid
+from datetime import datetime, timezone
+
+import bcrypt
+import pytest
+from markupsafe import Markup
+
+from app import db, sessions
+from app.sessions import ServerSession, dumps, loads, revoke_user_sessions
+from models import User
+
+
+@pytest.fixture(params=['sql', 'cookie'])
+def app(request, make_app):
+    app = make_app(SESSION_STORE=request.param)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bob', email='bob@example.com', phone_number='555-0100',
+                    password_hash=bcrypt.hashpw(b'Passw0rd!', bcrypt.gensalt(4)).decode())  # cheap to check
+        db.session.add(user)
+        db.session.commit()
+        app.user_id = user.id
+    return app
+
+
+def login(app, remember=False):
+    client = app.test_client()
+    data = {'username': 'bob', 'password': 'Passw0rd!'}
+    if remember:
+        data['remember'] = 'y'
+    client.post('/login', data=data)
+    return client
+
+
+def logged_in(client):
+    return b'Hello, bob' in client.get('/').data
+
+
+def test_revoke_signs_out_every_session(app):
+    first, second = login(app), login(app)
+    assert logged_in(first) and logged_in(second)
+    with app.app_context():
+        revoke_user_sessions(app.user_id)
+    assert not logged_in(first)
+    assert not logged_in(second)
+
+
+def test_revoke_beats_remember_me_cookie(app):
+    client = login(app, remember=True)
+    assert client.get_cookie('remember_token') is not None
+    with app.app_context():
+        revoke_user_sessions(app.user_id)
+    assert not logged_in(client)
+    assert logged_in(login(app, remember=True))  # signing in again works
+
+
+def test_logout_everywhere(app):
+    other = login(app, remember=True)
+    client = login(app)
+    client.get('/logout?everywhere=1')
+    assert not logged_in(client)
+    assert not logged_in(other)
+
+
+def test_save_after_revoke_does_not_resurrect_session(make_app):
+    app = make_app(SESSION_STORE='sql')
+    with app.app_context():
+        db.create_all()
+    store = app.session_interface.store
+    store.save('sid', 'user', b'j{}', time.time() + 60, new=True)
+    store.delete_user('user')
+    session = ServerSession({'_user_id': 'user:0', 'n': 1}, sid='sid', expires_at=time.time() + 60, user_id='user')
+    session.modified = True
+    with app.test_request_context():
+        response = app.response_class()
+        app.session_interface.save_session(app, session, response)
+    assert store.load('sid', time.time()) == (None, None, None)
+    assert 'session=;' in response.headers['Set-Cookie']
+
+
+def test_restored_account_does_not_revive_old_logins(app):
+    from app.archive import archive_user, restore_user
+
+    client = login(app, remember=True)
+    remembered = app.test_client()
+    remembered.set_cookie('remember_token', client.get_cookie('remember_token').value)
+    assert logged_in(client) and logged_in(remembered)
+    with app.app_context():
+        assert archive_user(app.user_id)
+        assert restore_user(app.user_id)
+    assert not logged_in(client)
+    assert not logged_in(remembered)
+    assert logged_in(login(app))
+
+
+SESSION_DATA = {
+    '_user_id': 'b6f7:3', '_fresh': True, 'n': 1,
+    'blob': b'\x00\xff', 'pair': (1, 'a'), 'notice': Markup('<b>saved</b>'),
+    'nested': {'at': datetime(2026, 10, 19, 12, tzinfo=timezone.utc), 'id': uuid.UUID(int=7), 'items': [b'x', (2,)]},
+}
+
+
+def assert_round_trips(blob):
+    data = loads(blob)
+    assert data == SESSION_DATA
+    assert type(data['pair']) is tuple and type(data['nested']['items'][1]) is tuple
+    assert type(data['notice']) is Markup and type(data['blob']) is bytes
+
+
+def test_json_session_round_trip(monkeypatch):
+    monkeypatch.setattr(sessions, 'msgpack', None)
+    blob = dumps(SESSION_DATA)
+    assert blob[:1] == b'j'
+    assert_round_trips(blob)
+
+
+def test_msgpack_session_round_trip(monkeypatch):
+    monkeypatch.setattr(sessions, 'msgpack', pytest.importorskip('msgpack'))
+    blob = dumps(SESSION_DATA)
+    assert blob[:1] == b'm'
+    assert_round_trips(blob)
+    with monkeypatch.context() as m:
+        m.setattr(sessions, 'msgpack', None)
+        json_blob = dumps(SESSION_DATA)
+    assert_round_trips(json_blob)  # sessions written by a worker without msgpack stay readable
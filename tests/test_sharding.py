@@ -0,0 +1,230 @@
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import bcrypt
+import jwt
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.archive import restore_user
+from app.sharding import SHARD_PREFIX, ShardMoving, bucket_for, claim_directory_entry, find_user, rebalance, shard_for
+from app.writer import submit_write, wait_write
+from models import (UserDirectory, User, Address, UserProfile, SocialProfile, EducationHistory, WorkExperience, Skill,
+                    DeletedUser, DeletedAddress, DeletedUserProfile, DeletedSocialProfile,
+                    DeletedEducationHistory, DeletedWorkExperience, DeletedSkill, soft_delete_generic)
+
+PASSWORD = 'Passw0rd!'
+PASSWORD_HASH = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(4)).decode()  # cheap to check
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(SQLALCHEMY_SHARD_URIS=[make_app.uri(f'shard{i}') for i in range(3)],
+                   SHARD_MAP_TTL=0)
+    result = app.test_cli_runner().invoke(args=['shards', 'init'])
+    assert result.exit_code == 0, result.output
+    return app
+
+
+def register(app, username):
+    return app.test_client().post('/registration', data={
+        'username': username, 'email': f'{username}@example.com', 'first_name': 'Al', 'last_name': 'Ice',
+        'date_of_birth': '01/02/1990', 'phone_number': '555-0100', 'street_address': '1 Main St',
+        'city': 'Springfield', 'state': 'IL', 'zip_code': '62701', 'country': 'US',
+        'password': PASSWORD, 'confirm_password': PASSWORD})
+
+
+def add_user(app, username):
+    """Create an account the way registration does, minus the slow password hashing."""
+    user_id = uuid.uuid4()
+
+    def create(session):
+        session.add(User(id=user_id, username=username, email=f'{username}@example.com',
+                         phone_number='555-0100', password_hash=PASSWORD_HASH))
+        session.add(Address(user_id=user_id, street_address='1 Main St', city='Springfield',
+                            state='IL', zip_code='62701', country='US'))
+        session.add(UserProfile(user_id=user_id, first_name='Al', last_name='Ice', date_of_birth=date(1990, 2, 1)))
+
+    with app.app_context():
+        claim_directory_entry(user_id, username, f'{username}@example.com')
+        wait_write(submit_write(create, user_id=user_id))
+    return user_id
+
+
+def login(app, username, password=PASSWORD):
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': password})
+    return client
+
+
+def logged_in(client, username):
+    return f'Hello, {username}'.encode() in client.get('/').data
+
+
+def put_skills(client, names, version=None, ids=()):
+    if version is None:
+        version = client.get('/api/profile/skills').json['version']
+    items = [{'id': item_id, 'skill_name': name} for item_id, name in zip(ids, names)]
+    items += [{'skill_name': name} for name in names[len(ids):]]
+    return client.put('/api/profile/skills', json={'version': version, 'items': items})
+
+
+def users_per_shard(app):
+    users = db.metadata.tables['user']
+    counts = []
+    with app.app_context():
+        for i in range(3):
+            with db.engines[f'{SHARD_PREFIX}{i}'].connect() as conn:
+                counts.append(conn.execute(sa.select(sa.func.count()).select_from(users)).scalar())
+    return counts
+
+
+def test_registration_stores_account_on_its_shard(app):
+    assert register(app, 'alice').status_code == 302
+    assert b'taken' in register(app, 'alice').data
+    with app.app_context():
+        entry = UserDirectory.query.filter_by(username='alice').one()
+        with db.engines[shard_for(entry.user_id)].connect() as conn:
+            row = conn.execute(sa.select(User.__table__).where(User.__table__.c.id == entry.user_id)).one()
+    assert row.email == 'alice@example.com'
+    assert sum(users_per_shard(app)) == 1
+
+
+def test_login_and_load_user(app):
+    add_user(app, 'bob')
+    assert not logged_in(login(app, 'bob', 'wrong'), 'bob')
+    client = login(app, 'bob')
+    assert logged_in(client, 'bob')
+    assert logged_in(client, 'bob')  # the next request loads the user from its shard again
+
+
+def test_password_reset(app):
+    user_id = add_user(app, 'bob')
+    token = jwt.encode({'user_id': str(user_id), 'exp': datetime.now(tz=timezone.utc) + timedelta(hours=1)},
+                       app.config['SECRET_KEY'], algorithm='HS256')
+    response = app.test_client().post(f'/password_reset/{token}',
+                                      data={'password': 'N3w-passw0rd!', 'confirm_password': 'N3w-passw0rd!'})
+    assert response.status_code == 302
+    assert not logged_in(login(app, 'bob'), 'bob')
+    assert logged_in(login(app, 'bob', 'N3w-passw0rd!'), 'bob')
+
+
+def test_rebalance_keeps_accounts_and_sessions(app):
+    for i in range(12):
+        add_user(app, f'user{i}')
+    client = login(app, 'user0')
+    with app.app_context():
+        rebalance(2, settle=0, echo=lambda message: None)
+    counts = users_per_shard(app)
+    assert counts[2] == 0 and sum(counts) == 12
+    assert logged_in(client, 'user0')
+    for i in range(12):
+        assert logged_in(login(app, f'user{i}'), f'user{i}')
+
+
+def test_moving_buckets_refuse_writes_until_flipped(app):
+    username, user_id = add_user_on(app, 'bob', f'{SHARD_PREFIX}2')
+    client = login(app, username)
+    put_skills(client, ['python'])
+    during = {}
+
+    def echo(message):
+        with app.app_context():
+            if bucket_for(user_id) not in app.extensions['sharding']['map'].moving():
+                return
+            with pytest.raises(ShardMoving):
+                shard_for(user_id, write=True)
+        during['read'] = client.get('/api/profile/skills').status_code
+        during['write'] = put_skills(client, ['rust']).status_code
+
+    with app.app_context():
+        rebalance(2, settle=0, echo=echo)
+    assert during == {'read': 200, 'write': 503}
+    assert [item['skill_name'] for item in client.get('/api/profile/skills').json['items']] == ['python']
+    assert put_skills(client, ['rust']).status_code == 200
+
+
+def test_rerun_finishes_an_interrupted_rebalance(app):
+    for i in range(12):
+        add_user(app, f'user{i}')
+
+    def interrupt(message):
+        if 'frozen' in message:
+            raise KeyboardInterrupt
+
+    with app.app_context():
+        with pytest.raises(KeyboardInterrupt):
+            rebalance(2, settle=0, echo=interrupt)
+        assert app.extensions['sharding']['map'].moving()
+        rebalance(2, settle=0, echo=lambda message: None)
+        assert not app.extensions['sharding']['map'].moving()
+    assert users_per_shard(app)[2] == 0
+    assert sum(users_per_shard(app)) == 12
+    for i in range(12):
+        assert logged_in(login(app, f'user{i}'), f'user{i}')
+
+
+def test_rebalance_moves_collection_rows_whose_ids_clash(app):
+    for i in range(30):
+        add_user(app, f'user{i}')
+        assert put_skills(login(app, f'user{i}'), [f'skill{i}a', f'skill{i}b']).status_code == 200
+    with app.app_context():
+        rebalance(2, settle=0, echo=lambda message: None)
+    assert users_per_shard(app)[2] == 0
+    for i in range(30):
+        client = login(app, f'user{i}')
+        skills = client.get('/api/profile/skills').json
+        assert sorted(item['skill_name'] for item in skills['items']) == [f'skill{i}a', f'skill{i}b']
+
+
+def add_user_on(app, username, shard):
+    """add_user, retried under fresh ids until the account lands on ``shard``."""
+    for attempt in range(100):
+        user_id = add_user(app, f'{username}{attempt}')
+        with app.app_context():
+            if shard_for(user_id) == shard:
+                return f'{username}{attempt}', user_id
+
+
+def test_edit_with_ids_read_before_a_move_is_refused(app):
+    username, _ = add_user_on(app, 'bob', f'{SHARD_PREFIX}1')
+    client = login(app, username)
+    before = put_skills(client, ['python']).json
+    with app.app_context():
+        rebalance(1, settle=0, echo=lambda message: None)
+    response = put_skills(client, ['rust'], version=before['version'], ids=[before['items'][0]['id']])
+    assert response.status_code == 409
+    assert put_skills(client, ['rust']).status_code == 200
+
+
+def test_soft_delete_into_tables_gives_rows_new_ids(app):
+    app.config['DELETED_USER_STORE'] = 'tables'
+    deleted_model_map = {
+        User: DeletedUser, Address: DeletedAddress, UserProfile: DeletedUserProfile,
+        SocialProfile: DeletedSocialProfile, EducationHistory: DeletedEducationHistory,
+        WorkExperience: DeletedWorkExperience, Skill: DeletedSkill,
+    }
+    shard = f'{SHARD_PREFIX}0'
+    # The second account's skill reuses the id the first one's had before it was deleted
+    for name in ('ann', 'ben'):
+        username, user_id = add_user_on(app, name, shard)
+        put_skills(login(app, username), ['python'])
+        with app.app_context():
+            assert soft_delete_generic(User, str(user_id), deleted_model_map) is None
+    with app.app_context(), db.engines[shard].connect() as conn:
+        deleted = conn.execute(sa.select(DeletedSkill.__table__)).all()
+    assert len(deleted) == 2
+
+
+def test_archived_account_restores_with_fresh_row_ids(app):
+    username, user_id = add_user_on(app, 'ann', f'{SHARD_PREFIX}0')
+    put_skills(login(app, username), ['python', 'sql'])
+    with app.app_context():
+        assert soft_delete_generic(User, str(user_id), {}) is None
+    other, _ = add_user_on(app, 'ben', f'{SHARD_PREFIX}0')
+    put_skills(login(app, other), ['go', 'c'])  # takes the ids ann's skills had
+    with app.app_context():
+        assert restore_user(user_id)
+    skills = login(app, username).get('/api/profile/skills').json['items']
+    assert sorted(item['skill_name'] for item in skills) == ['python', 'sql']
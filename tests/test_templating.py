@@ -0,0 +1,65 @@
+import itertools
+
+import bcrypt
+import pytest
+
+from app import db
+from models import User
+
+PASSWORD_HASH = bcrypt.hashpw(b'Passw0rd!', bcrypt.gensalt(4)).decode()  # cheap to check
+
+
+def render_counted(app, template, **context):
+    """Render ``template`` from a string; pass a ``count`` that goes up each time a cached body is really rendered."""
+    with app.test_request_context():
+        return app.jinja_env.from_string(template).render(**context)
+
+
+@pytest.fixture
+def counter():
+    return itertools.count(1).__next__
+
+
+ITEM = "{% cache 'item', n %}{{ n }}:{{ count() }}{% endcache %}"
+
+
+def test_home_fragment_is_cached_per_user(make_app):
+    app = make_app(TEMPLATE_FRAGMENT_CACHE_SIZE=16)
+    with app.app_context():
+        db.create_all()
+        for name in ('alice', 'bob'):
+            db.session.add(User(username=name, email=f'{name}@example.com', phone_number='555-0100',
+                                password_hash=PASSWORD_HASH))
+        db.session.commit()
+
+    pages = {}
+    for name in ('alice', 'bob', 'alice'):
+        client = app.test_client()
+        client.post('/login', data={'username': name, 'password': 'Passw0rd!'})
+        pages.setdefault(name, []).append(client.get('/').data)
+    anonymous = app.test_client().get('/').data
+
+    assert b'Hello, alice!' in pages['alice'][0] and b'bob' not in pages['alice'][0]
+    assert b'Hello, bob!' in pages['bob'][0] and b'alice' not in pages['bob'][0]
+    assert pages['alice'][1] == pages['alice'][0]
+    assert b'Please log in' in anonymous and b'Hello' not in anonymous
+    assert app.jinja_env.fragment_cache.hits > 0
+
+
+def test_least_recently_used_fragment_is_evicted(make_app, counter):
+    app = make_app(TEMPLATE_FRAGMENT_CACHE_SIZE=2)
+
+    def render(n):
+        return render_counted(app, ITEM, n=n, count=counter)
+
+    assert [render(1), render(2), render(1)] == ['1:1', '2:2', '1:1']
+    assert render(3) == '3:3'  # evicts 2, the least recently used
+    assert len(app.jinja_env.fragment_cache) == 2
+    assert render(1) == '1:1'
+    assert render(2) == '2:4'
+
+
+def test_size_zero_disables_caching(make_app, counter):
+    app = make_app(TEMPLATE_FRAGMENT_CACHE_SIZE=0)
+    assert app.jinja_env.fragment_cache is None
+    assert [render_counted(app, ITEM, n=1, count=counter) for _ in range(3)] == ['1:1', '1:2', '1:3']
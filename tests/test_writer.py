@@ -0,0 +1,130 @@
+import threading
+from concurrent.futures import CancelledError, Future, TimeoutError
+
+import pytest
+import sqlalchemy as sa
+
+from app.writer import WriteQueue, configure_sqlite, wait_write
+
+metadata = sa.MetaData()
+item = sa.Table('item', metadata, sa.Column('id', sa.Integer, primary_key=True))
+
+
+@pytest.fixture
+def engines(tmp_path):
+    engines = {None: sa.create_engine(f'sqlite:///{tmp_path / "primary.db"}'),
+               'shard1': sa.create_engine(f'sqlite:///{tmp_path / "shard1.db"}')}
+    for engine in engines.values():
+        configure_sqlite(engine, busy_timeout=1)
+        metadata.create_all(engine)
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
+
+
+@pytest.fixture
+def write_queue(engines):
+    write_queue = WriteQueue(engines, max_delay=0.05)
+    yield write_queue
+    write_queue.stop()
+
+
+def hold(write_queue, bind_key=None):
+    """Occupy the writer until the returned event is set, so later jobs queue up behind it."""
+    started, release = threading.Event(), threading.Event()
+
+    def blocker(session):
+        started.set()
+        release.wait(5)
+
+    write_queue.submit(blocker, bind_key)
+    assert started.wait(5)
+    return release
+
+
+def insert(item_id):
+    return lambda session: session.execute(item.insert(), {'id': item_id}).rowcount
+
+
+def ids(engine):
+    with engine.connect() as conn:
+        return sorted(conn.execute(sa.select(item.c.id)).scalars())
+
+
+def test_queued_jobs_commit_in_one_batch(write_queue, engines):
+    release = hold(write_queue)
+    futures = [write_queue.submit(insert(i)) for i in range(5)]
+    release.set()
+    assert [future.result(5) for future in futures] == [1] * 5
+    assert ids(engines[None]) == [0, 1, 2, 3, 4]
+    assert write_queue.batches == 2 and write_queue.jobs == 6
+
+
+def test_failing_job_only_fails_its_own_future(write_queue, engines):
+    release = hold(write_queue)
+    first, duplicate, last = write_queue.submit(insert(1)), write_queue.submit(insert(1)), write_queue.submit(insert(2))
+    release.set()
+    assert first.result(5) == 1 and last.result(5) == 1
+    with pytest.raises(sa.exc.IntegrityError):
+        duplicate.result(5)
+    assert ids(engines[None]) == [1, 2]
+
+
+def test_operational_error_fails_the_whole_batch(write_queue, engines):
+    calls = []
+
+    def broken(session):
+        calls.append('broken')
+        session.execute(sa.text('SELECT * FROM missing'))
+
+    def fine(session):
+        calls.append('fine')
+        return insert(1)(session)
+
+    release = hold(write_queue)
+    futures = [write_queue.submit(broken), write_queue.submit(fine)]
+    release.set()
+    for future in futures:
+        with pytest.raises(sa.exc.OperationalError):
+            future.result(5)
+    assert calls == ['broken']  # not retried job by job
+    assert ids(engines[None]) == []
+
+
+def test_cancelled_job_never_runs(write_queue, engines):
+    release = hold(write_queue)
+    cancelled, kept = write_queue.submit(insert(1)), write_queue.submit(insert(2))
+    assert cancelled.cancel()
+    release.set()
+    assert kept.result(5) == 1
+    assert ids(engines[None]) == [2]
+
+
+def test_jobs_are_committed_per_bind(write_queue, engines):
+    release = hold(write_queue)
+    futures = [write_queue.submit(insert(1)), write_queue.submit(insert(2), 'shard1'),
+               write_queue.submit(insert(3)), write_queue.submit(insert(4), 'shard1')]
+    release.set()
+    assert [future.result(5) for future in futures] == [1] * 4
+    assert ids(engines[None]) == [1, 3]
+    assert ids(engines['shard1']) == [2, 4]
+    assert write_queue.batches == 3  # the blocker, then one transaction per bind
+
+
+def test_wait_write_cancels_a_queued_write_at_the_deadline(make_app):
+    future = Future()
+    with make_app(WRITE_TIMEOUT=0.01).app_context():
+        with pytest.raises(TimeoutError):
+            wait_write(future)
+    assert future.cancelled()
+    with pytest.raises(CancelledError):
+        future.result(0)
+
+
+def test_wait_write_gives_up_on_a_started_write(make_app):
+    future = Future()
+    future.set_running_or_notify_cancel()
+    with make_app(WRITE_TIMEOUT=0.01, SQLITE_BUSY_TIMEOUT=0.01).app_context():
+        with pytest.raises(TimeoutError):
+            wait_write(future)
+    assert not future.done()